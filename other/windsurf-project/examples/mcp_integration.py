@@ -10,13 +10,21 @@ This example shows how to:
 import asyncio
 import json
 import logging
-from datetime import datetime
 import time
-import httpx
+from typing import List
 
+import msgspec
+
+from mitm.http import get_http_client, close_http_client
 from mitm.tool_discovery import ToolDiscovery, MCPServer
 from mitm.llm_interface import LLMInterface
-from mitm.models import ToolDefinition, ParameterSchema, ToolType, ToolExecutionRequest
+from mitm.models import (
+    MCPToolSchema,
+    ParameterSchema,
+    ToolDefinition,
+    ToolExecutionRequest,
+    ToolType
+)
 from mitm.config import settings
 
 # Configure logging
@@ -26,13 +34,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Reusable decoder; msgspec validates the payload while decoding it
+_tools_decoder = msgspec.json.Decoder(List[MCPToolSchema])
+
 class MCPConnector:
     """Connector for MCP servers that implements tool discovery and execution."""
     
     def __init__(self, name: str, base_url: str):
         self.name = name
         self.base_url = base_url.rstrip('/')
-        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=10.0)
     
     async def discover_tools(self) -> dict:
         """
@@ -42,28 +52,34 @@ class MCPConnector:
             Dictionary mapping tool names to ToolDefinition objects
         """
         try:
-            response = await self.client.get("/tools")
-            response.raise_for_status()
+            # Collect the body as it arrives, then decode it in a single pass
+            body = bytearray()
+            async with get_http_client().stream("GET", f"{self.base_url}/tools") as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    body += chunk
             
-            server_tools = response.json()
+            server_tools = _tools_decoder.decode(body)
             tools = {}
             
             for tool_data in server_tools:
-                # Convert the MCP server's tool schema to our internal format
-                parameters = {}
-                for param_name, param_data in tool_data.get("parameters", {}).items():
-                    parameters[param_name] = ParameterSchema(
-                        type=param_data.get("type", "string"),
-                        description=param_data.get("description", ""),
-                        required=param_data.get("required", True),
-                        enum=param_data.get("enum")
+                # Convert the MCP server's tool schema to our internal format;
+                # the fields are already validated, so skip pydantic validation
+                parameters = {
+                    param_name: ParameterSchema.model_construct(
+                        type=param_data.type,
+                        description=param_data.description,
+                        required=param_data.required,
+                        enum=param_data.enum
                     )
+                    for param_name, param_data in tool_data.parameters.items()
+                }
                 
                 # Create the tool definition
-                tool_name = f"{self.name}_{tool_data['name']}"
-                tools[tool_name] = ToolDefinition(
+                tool_name = f"{self.name}_{tool_data.name}"
+                tools[tool_name] = ToolDefinition.model_construct(
                     name=tool_name,
-                    description=tool_data.get("description", ""),
+                    description=tool_data.description,
                     parameters=parameters,
                     server_name=self.name,
                     tool_type=ToolType.MCP,
@@ -93,8 +109,8 @@ class MCPConnector:
             actual_tool_name = tool_name[len(self.name) + 1:]
             
             # Execute the tool on the MCP server
-            response = await self.client.post(
-                f"/execute/{actual_tool_name}",
+            response = await get_http_client().post(
+                f"{self.base_url}/execute/{actual_tool_name}",
                 json={"parameters": parameters}
             )
             response.raise_for_status()
@@ -129,9 +145,11 @@ async def main():
         
         # Discover tools from the server
         logger.info("Discovering tools from mock MCP server...")
+        tool_discovery.set_server_tools(
+            "mockserver",
+            await mock_mcp_connector.discover_tools()
+        )
         mock_server = tool_discovery.servers["mockserver"]
-        mock_server.tools = await mock_mcp_connector.discover_tools()
-        mock_server.last_updated = datetime.utcnow()
         
         # Print discovered tools
         logger.info(f"Discovered {len(mock_server.tools)} tools from mock MCP server")
@@ -143,13 +161,13 @@ async def main():
         logger.info(f"Processing user query: \"{user_query}\"")
         
         # Use the LLM to search for relevant tools
-        start_time = time.time()
+        start_time = time.perf_counter()
         search_result = await llm_interface.search_tools(
             user_query,
             tool_discovery.get_all_tools(),
             limit=3
         )
-        search_time = time.time() - start_time
+        search_time = time.perf_counter() - start_time
         
         # Print search results
         logger.info(f"Found {len(search_result.tools)} relevant tools in {search_time:.2f}s:")
@@ -187,7 +205,7 @@ async def main():
         # Clean up
         await tool_discovery.stop()
         await llm_interface.close()
-        await mock_mcp_connector.client.aclose()
+        await close_http_client()
 
 if __name__ == "__main__":
     asyncio.run(main())
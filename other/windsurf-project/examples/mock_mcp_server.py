@@ -6,9 +6,13 @@ This simple FastAPI server simulates an MCP server with a few example tools.
 import asyncio
 import json
 import logging
+import re
+from collections import defaultdict
 from typing import Dict, List, Any, Optional
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, Response
+import orjson
 from pydantic import BaseModel, Field
 import uvicorn
 
@@ -23,7 +27,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Mock MCP Server",
     description="A mock MCP server for testing Model in the Middle",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=ORJSONResponse
 )
 
 # Data models
@@ -51,6 +56,26 @@ documents = {
     "doc3": {"id": "doc3", "title": "Important Document", "content": "This document contains important information.", "tags": ["important"]},
 }
 
+# Secondary indexes over the documents: lowercased tag / word -> document IDs.
+# The inner dicts are used as insertion-ordered sets.
+_tag_index: Dict[str, Dict[str, None]] = defaultdict(dict)
+_token_index: Dict[str, Dict[str, None]] = defaultdict(dict)
+_TOKEN_RE = re.compile(r"\w+")
+
+def _tokenize(text: str) -> List[str]:
+    """Split text into lowercased words."""
+    return _TOKEN_RE.findall(text.lower())
+
+def _index_document(doc: Dict[str, Any]):
+    """Add a document to the tag and word indexes."""
+    for tag in doc.get("tags", []):
+        _tag_index[tag.lower()][doc["id"]] = None
+    for token in _tokenize(doc["title"]) + _tokenize(doc["content"]):
+        _token_index[token][doc["id"]] = None
+
+for _doc in documents.values():
+    _index_document(_doc)
+
 # Available tools
 tools = {
     "get_document": ToolDefinition(
@@ -114,6 +139,10 @@ tools = {
     )
 }
 
+# The tool registry never changes at runtime, so serialize it once
+_TOOLS_JSON = orjson.dumps([tool.model_dump() for tool in tools.values()])
+_TOOL_JSON = {name: orjson.dumps(tool.model_dump()) for name, tool in tools.items()}
+
 # API Endpoints
 @app.get("/")
 async def root():
@@ -127,14 +156,14 @@ async def root():
 @app.get("/tools")
 async def list_tools():
     """List all available tools."""
-    return list(tools.values())
+    return Response(content=_TOOLS_JSON, media_type="application/json")
 
 @app.get("/tools/{tool_name}")
 async def get_tool(tool_name: str):
     """Get details of a specific tool."""
     if tool_name not in tools:
         raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found")
-    return tools[tool_name]
+    return Response(content=_TOOL_JSON[tool_name], media_type="application/json")
 
 @app.post("/execute/{tool_name}")
 async def execute_tool(tool_name: str, request: ToolExecutionRequest):
@@ -180,13 +209,18 @@ async def execute_get_document(parameters: Dict[str, Any]):
 
 async def execute_search_documents(parameters: Dict[str, Any]):
     """Implementation of the search_documents tool."""
-    query = parameters["query"].lower()
+    tokens = _tokenize(parameters["query"])
     limit = parameters.get("limit", 10)
     
+    if not tokens:
+        return {"result": list(documents.values())[:limit]}
+    
+    # Documents must contain every query word; walk the shortest posting list
+    postings = sorted((_token_index.get(token, {}) for token in tokens), key=len)
     results = []
-    for doc in documents.values():
-        if query in doc["title"].lower() or query in doc["content"].lower():
-            results.append(doc)
+    for doc_id in postings[0]:
+        if all(doc_id in posting for posting in postings[1:]):
+            results.append(documents[doc_id])
             if len(results) >= limit:
                 break
     
@@ -195,13 +229,7 @@ async def execute_search_documents(parameters: Dict[str, Any]):
 async def execute_list_documents_by_tag(parameters: Dict[str, Any]):
     """Implementation of the list_documents_by_tag tool."""
     tag = parameters["tag"].lower()
-    
-    results = []
-    for doc in documents.values():
-        if tag in [t.lower() for t in doc.get("tags", [])]:
-            results.append(doc)
-    
-    return {"result": results}
+    return {"result": [documents[doc_id] for doc_id in _tag_index.get(tag, ())]}
 
 async def execute_create_document(parameters: Dict[str, Any]):
     """Implementation of the create_document tool."""
@@ -219,6 +247,7 @@ async def execute_create_document(parameters: Dict[str, Any]):
         "content": content,
         "tags": tags
     }
+    _index_document(documents[doc_id])
     
     return {"result": documents[doc_id]}
 
@@ -1,6 +1,6 @@
 import os
-from typing import Dict, Any
-from pydantic import BaseSettings
+from typing import Dict, Any, Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     # Server configuration
@@ -12,17 +12,32 @@ class Settings(BaseSettings):
     LOCAL_LLM_ENDPOINT: str = "http://localhost:5000/generate"
     MAX_TOKENS: int = 1000
     TEMPERATURE: float = 0.7
+    LLM_BATCH_WINDOW: float = 0.02  # seconds
+    LLM_BATCH_MAX_SIZE: int = 16  # 1 disables batching
+    
+    # Semantic cache
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_SIZE: int = 1024
+    SEMANTIC_CACHE_THRESHOLD: float = 0.9
+    SEMANTIC_CACHE_TTL: float = 3600.0  # seconds; 0 keeps entries until evicted
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_ONNX_DIR: Optional[str] = None  # int8 ONNX export of EMBEDDING_MODEL
+    TOOL_ANN_CANDIDATES: int = 20  # tools shortlisted by embedding for the LLM
+    TOOL_EMBEDDING_CACHE_PATH: Optional[str] = None
     
     # Tool discovery
     TOOL_DISCOVERY_INTERVAL: int = 300  # seconds
+    TOOL_DISCOVERY_CACHE_PATH: Optional[str] = None  # reused across restarts
     MAX_TOOLS_PER_PAGE: int = 10
     
     # Logging
     LOG_LEVEL: str = "INFO"
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = 'utf-8'
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore"
+    )
 
 # Initialize settings
 settings = Settings()
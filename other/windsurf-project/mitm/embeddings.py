@@ -0,0 +1,187 @@
+"""Local sentence encoders used to embed queries and tool descriptions."""
+import logging
+import os
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Optional, Union
+
+import numpy as np
+
+try:
+    from sentence_transformers import SentenceTransformer
+    _SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    _SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+try:
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+    _ONNX_AVAILABLE = True
+except ImportError:
+    _ONNX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Files written by export_onnx_encoder and read by OnnxEncoder
+ONNX_MODEL_FILE = "model_quantized.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+MAX_SEQUENCE_LENGTH = 256
+# Number of distinct query texts whose embeddings each encoder keeps
+QUERY_CACHE_SIZE = 4096
+
+
+class _Encoder(ABC):
+    """Base for encoders: memoizes single-text embeddings per instance."""
+
+    dim: int
+
+    def __init__(self):
+        self._encode_cached = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._encode_one)
+
+    def encode(self, text: str) -> np.ndarray:
+        """
+        Return the unit-length embedding of ``text`` as a 1-D float32 array.
+
+        Repeated texts skip the model entirely. The array is shared between
+        callers, so it is read-only.
+        """
+        return self._encode_cached(text)
+
+    @abstractmethod
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Return the unit-length embeddings of ``texts`` as an ``(n, d)`` array."""
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        embedding = self.encode_batch([text])[0]
+        embedding.setflags(write=False)
+        return embedding
+
+
+class SentenceEncoder(_Encoder):
+    """Encode text into L2-normalized float32 vectors with sentence-transformers."""
+
+    def __init__(self, model_name: str):
+        super().__init__()
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Return the unit-length embeddings of ``texts`` as an ``(n, d)`` array."""
+        embeddings = self.model.encode(
+            texts,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+
+class OnnxEncoder(_Encoder):
+    """
+    Encode text with an int8-quantized ONNX export of a sentence encoder.
+
+    Produces the same mean-pooled, L2-normalized embeddings as
+    ``SentenceEncoder`` without loading PyTorch.
+    """
+
+    def __init__(self, model_dir: str):
+        super().__init__()
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILE),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {node.name for node in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_padding()
+        self.tokenizer.enable_truncation(max_length=MAX_SEQUENCE_LENGTH)
+
+        # Also runs the session once, so the first real query is not a cold start
+        self.dim = self.encode("").shape[0]
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Return the unit-length embeddings of ``texts`` as an ``(n, d)`` array."""
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, feeds)[0]
+
+        # Mean-pool over real tokens, then normalize
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.maximum(norms, 1e-12)).astype(np.float32, copy=False)
+
+
+def export_onnx_encoder(model_name: str, output_dir: str) -> str:
+    """
+    Export a sentence-transformers model to ONNX and quantize it to int8.
+
+    Requires the onnx-export extra; this is a one-time build step, not needed
+    to serve.
+
+    Args:
+        model_name: Hugging Face model to export
+        output_dir: Directory for the ONNX model and tokenizer
+
+    Returns:
+        Path of the quantized model
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoTokenizer
+
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+
+    quantized_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    quantize_dynamic(
+        os.path.join(output_dir, "model.onnx"),
+        quantized_path,
+        weight_type=QuantType.QInt8
+    )
+    logger.info(f"Exported int8 ONNX encoder for {model_name} to {quantized_path}")
+    return quantized_path
+
+
+def load_encoder(
+    model_name: str,
+    onnx_dir: Optional[str] = None
+) -> Optional[Union[OnnxEncoder, SentenceEncoder]]:
+    """
+    Load the local sentence encoder, if available.
+
+    Args:
+        model_name: sentence-transformers model to load
+        onnx_dir: Directory written by ``export_onnx_encoder``; preferred over
+            ``model_name`` when set and onnxruntime is installed
+
+    Returns:
+        The encoder, or None when neither backend is installed or the model
+        cannot be loaded.
+    """
+    if onnx_dir:
+        if _ONNX_AVAILABLE:
+            try:
+                return OnnxEncoder(onnx_dir)
+            except Exception as e:
+                logger.warning(f"Failed to load ONNX encoder from {onnx_dir}: {e}")
+        else:
+            logger.info("onnxruntime not installed; falling back to sentence-transformers")
+
+    if not _SENTENCE_TRANSFORMERS_AVAILABLE:
+        logger.info("sentence-transformers not installed; semantic cache disabled")
+        return None
+
+    try:
+        return SentenceEncoder(model_name)
+    except Exception as e:
+        logger.warning(f"Failed to load embedding model {model_name}: {e}")
+        return None
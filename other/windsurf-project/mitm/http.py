@@ -0,0 +1,30 @@
+"""Shared HTTP client for talking to MCP servers."""
+from functools import lru_cache
+
+import httpx
+
+
+@lru_cache(maxsize=None)
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the process-wide pooled HTTP client.
+
+    Reusing one client keeps connections alive between requests instead of
+    paying connection and TLS setup on every call.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_keepalive_connections=100,
+            max_connections=200,
+            keepalive_expiry=30.0
+        ),
+        timeout=httpx.Timeout(10.0),
+        http2=True
+    )
+
+
+async def close_http_client():
+    """Close the shared client; the next get_http_client() call creates a new one."""
+    if get_http_client.cache_info().currsize:
+        await get_http_client().aclose()
+        get_http_client.cache_clear()
@@ -1,32 +1,338 @@
-import json
+import asyncio
 import logging
+import time
 import aiohttp
-from typing import Dict, List, Optional, Any, Tuple
+import msgspec
+import numpy as np
+import orjson
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 
-from .models import ToolDefinition, ToolSearchResult
+from .models import RankedQuery, RankItem, ToolDefinition, ToolSearchResult
 from .config import settings
+from .embeddings import load_encoder
+from .tool_index import ToolIndex, serialize_tools, warm_up
+
+try:
+    import hnswlib
+    _HNSW_AVAILABLE = True
+except ImportError:
+    _HNSW_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Decode and validate ranking responses in one pass; strict=False accepts
+# numbers the model quotes as strings
+_rank_decoder = msgspec.json.Decoder(List[RankItem], strict=False)
+_batch_rank_decoder = msgspec.json.Decoder(List[RankedQuery], strict=False)
+
+# Cache size above which lookups go through an HNSW index instead of a full scan
+HNSW_THRESHOLD = 4096
+# Number of recent inserts scanned densely before being merged into the index
+HNSW_MERGE_BATCH = 256
+HNSW_EF = 64
+
+
+class SemanticCache:
+    """
+    Cache of tool search results keyed by L2-normalized query embeddings.
+
+    Embeddings are stored as rows of a single ``(N, d)`` matrix, so a lookup is
+    one matrix-vector product followed by an argmax. Once ``max_size`` entries
+    are cached, the least recently used entry is overwritten.
+    
+    When hnswlib is installed and the cache grows past ``HNSW_THRESHOLD``
+    entries, rows are also added to an HNSW index for logarithmic lookups.
+    Recent inserts stay in a small pending set that is scanned densely and
+    merged into the index every ``HNSW_MERGE_BATCH`` inserts.
+
+    With a positive ``ttl``, entries older than ``ttl`` seconds are never
+    returned; they are dropped when looked up and pruned before any live
+    entry is evicted.
+    """
+
+    def __init__(self, max_size: int, threshold: float, ttl: float = 0.0):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def clear(self):
+        """Drop all cached entries."""
+        self._embeddings: Optional[np.ndarray] = None
+        self._last_used = np.zeros(0, dtype=np.int64)
+        self._inserted_at = np.zeros(0, dtype=np.float64)
+        self._results: List[ToolSearchResult] = []
+        self._limits: List[int] = []
+        self._size = 0
+        self._clock = 0
+        self._index = None
+        self._indexed = np.zeros(0, dtype=bool)
+        self._pending: List[int] = []
+
+    def lookup(self, embedding: np.ndarray, limit: int) -> Optional[ToolSearchResult]:
+        """
+        Find a cached result for a query similar to ``embedding``.
+
+        Args:
+            embedding: L2-normalized query embedding
+            limit: Number of tools the caller wants
+
+        Returns:
+            The cached ToolSearchResult (truncated to ``limit``), or None on a miss
+        """
+        if self._size == 0:
+            return None
+
+        while True:
+            index, similarity = self._nearest(embedding)
+            if similarity < self.threshold:
+                return None
+            if not self._expired(index, time.monotonic()):
+                break
+            self._expire([index])
+
+        if self._limits[index] < limit:
+            return None
+
+        self._clock += 1
+        self._last_used[index] = self._clock
+
+        result = self._results[index]
+        if self._limits[index] > limit:
+            tools = result.tools[:limit]
+            result = ToolSearchResult(
+                tools=tools,
+                confidence_scores={
+                    tool.name: result.confidence_scores[tool.name] for tool in tools
+                }
+            )
+        return result
+
+    def insert(self, embedding: np.ndarray, result: ToolSearchResult, limit: int):
+        """Cache ``result`` for the query embedded as ``embedding``."""
+        self._clock += 1
+
+        if self._size < self.max_size:
+            index = self._size
+            if self._embeddings is None or index == len(self._embeddings):
+                self._grow(embedding.shape[0])
+            self._results.append(result)
+            self._limits.append(limit)
+            self._size += 1
+        else:
+            # Evict the least recently used entry, expired entries first
+            self.prune()
+            index = int(np.argmin(self._last_used[:self._size]))
+            self._results[index] = result
+            self._limits[index] = limit
+
+        self._embeddings[index] = embedding
+        self._last_used[index] = self._clock
+        self._inserted_at[index] = time.monotonic()
+
+        if self._index is not None:
+            self._add_pending(index)
+        elif _HNSW_AVAILABLE and self._size > HNSW_THRESHOLD:
+            self._build_index()
+
+    def prune(self) -> int:
+        """Drop every expired entry and return how many were dropped."""
+        if self.ttl <= 0 or self._size == 0:
+            return 0
+
+        expired = np.flatnonzero(
+            (self._inserted_at[:self._size] > 0)
+            & self._expired(slice(0, self._size), time.monotonic())
+        )
+        self._expire(expired.tolist())
+        return len(expired)
+
+    def _expired(self, index, now: float):
+        """Whether the entries at ``index`` were inserted more than ``ttl`` ago."""
+        return (self.ttl > 0) & (now - self._inserted_at[index] > self.ttl)
+
+    def _expire(self, indices: List[int]):
+        """
+        Hide entries from lookups and make them the next to be evicted.
+
+        The rows keep their slots: a zero embedding never reaches the
+        similarity threshold, and a zero last-used time sorts first for LRU.
+        """
+        for index in indices:
+            self._embeddings[index] = 0.0
+            self._last_used[index] = 0
+            self._inserted_at[index] = 0.0
+            if self._index is not None:
+                if self._indexed[index]:
+                    self._index.mark_deleted(index)
+                    self._indexed[index] = False
+                elif index in self._pending:
+                    self._pending.remove(index)
+
+    def _nearest(self, embedding: np.ndarray) -> Tuple[int, float]:
+        """Return the row index and cosine similarity of the closest entry."""
+        if self._index is None:
+            sims = self._embeddings[:self._size] @ embedding
+            index = int(np.argmax(sims))
+            return index, float(sims[index])
+
+        best_index, best_similarity = -1, -np.inf
+        try:
+            labels, distances = self._index.knn_query(embedding, k=1)
+            best_index = int(labels[0][0])
+            best_similarity = 1.0 - float(distances[0][0])
+        except RuntimeError:
+            # Every indexed entry has been evicted
+            pass
+
+        if self._pending:
+            sims = self._embeddings[self._pending] @ embedding
+            i = int(np.argmax(sims))
+            if sims[i] > best_similarity:
+                best_index, best_similarity = self._pending[i], float(sims[i])
+
+        return best_index, best_similarity
+
+    def _build_index(self):
+        """Index every cached row in a new HNSW graph."""
+        dim = self._embeddings.shape[1]
+        self._index = hnswlib.Index(space="cosine", dim=dim)
+        self._index.init_index(max_elements=self.max_size)
+        self._index.set_ef(HNSW_EF)
+        self._index.add_items(
+            self._embeddings[:self._size],
+            np.arange(self._size)
+        )
+        self._indexed = np.zeros(len(self._embeddings), dtype=bool)
+        self._indexed[:self._size] = True
+        self._pending = []
+
+    def _add_pending(self, index: int):
+        """Queue a newly written row, merging the queue into the index when full."""
+        if index >= len(self._indexed):
+            indexed = np.zeros(len(self._embeddings), dtype=bool)
+            indexed[:len(self._indexed)] = self._indexed
+            self._indexed = indexed
+
+        if self._indexed[index]:
+            # The row was overwritten by eviction; hide its stale vector
+            self._index.mark_deleted(index)
+            self._indexed[index] = False
+        elif index in self._pending:
+            return
+        self._pending.append(index)
+
+        if len(self._pending) >= HNSW_MERGE_BATCH:
+            # Re-adding a deleted label replaces its vector and restores it
+            self._index.add_items(self._embeddings[self._pending], self._pending)
+            self._indexed[self._pending] = True
+            self._pending = []
+
+    def _grow(self, dim: int):
+        """Double the preallocated capacity, up to ``max_size`` rows."""
+        capacity = 0 if self._embeddings is None else len(self._embeddings)
+        new_capacity = min(max(16, capacity * 2), self.max_size)
+
+        embeddings = np.zeros((new_capacity, dim), dtype=np.float32)
+        last_used = np.zeros(new_capacity, dtype=np.int64)
+        inserted_at = np.zeros(new_capacity, dtype=np.float64)
+        if capacity:
+            embeddings[:capacity] = self._embeddings
+            last_used[:capacity] = self._last_used
+            inserted_at[:capacity] = self._inserted_at
+        self._embeddings = embeddings
+        self._last_used = last_used
+        self._inserted_at = inserted_at
+
+
+@dataclass
+class _PendingSearch:
+    """A query waiting in the batch queue for its ranked tools."""
+    query: str
+    tools: Sequence[ToolDefinition]
+    limit: int
+    future: asyncio.Future
+    catalog_id: int  # id() of the full tool set the candidates came from
+
+
 class LLMInterface:
     def __init__(self, endpoint: Optional[str] = None):
         self.endpoint = endpoint or settings.LOCAL_LLM_ENDPOINT
+        # The generation parameters never change per call, so serialize them
+        # once and splice each prompt in front of them
+        self._payload_tail = orjson.dumps({
+            "max_tokens": settings.MAX_TOKENS,
+            "temperature": settings.TEMPERATURE,
+        })[1:]
         self.session: Optional[aiohttp.ClientSession] = None
+        self.encoder = None
+        self.semantic_cache = SemanticCache(
+            max_size=settings.SEMANTIC_CACHE_SIZE,
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            ttl=settings.SEMANTIC_CACHE_TTL
+        )
+        # Tool set the semantic cache's results were ranked against
+        self._cached_tools: Optional[Sequence[ToolDefinition]] = None
+        self._batch_queue: Optional[asyncio.Queue] = None
+        self._batch_task: Optional[asyncio.Task] = None
+        self._inflight_batches: set = set()
     
     async def initialize(self):
-        """Initialize the HTTP session."""
+        """Initialize the HTTP session, the query encoder and the batch worker."""
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=200,
+                    limit_per_host=100,
+                    keepalive_timeout=30,
+                    use_dns_cache=True,
+                    ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(total=30, connect=2)
+            )
+        
+        if settings.SEMANTIC_CACHE_ENABLED and self.encoder is None:
+            self.encoder = load_encoder(
+                settings.EMBEDDING_MODEL,
+                onnx_dir=settings.EMBEDDING_ONNX_DIR
+            )
+        
+        # Compile the fallback scoring kernel before it is first needed
+        warm_up()
+        
+        if settings.LLM_BATCH_MAX_SIZE > 1 and self._batch_task is None:
+            self._batch_queue = asyncio.Queue()
+            self._batch_task = asyncio.create_task(self._batch_worker())
     
     async def close(self):
-        """Close the HTTP session."""
+        """Stop the batch worker and close the HTTP session."""
+        if self._batch_task:
+            self._batch_task.cancel()
+            for task in list(self._inflight_batches):
+                task.cancel()
+            await asyncio.gather(
+                self._batch_task, *self._inflight_batches, return_exceptions=True
+            )
+            while not self._batch_queue.empty():
+                pending = self._batch_queue.get_nowait()
+                if not pending.future.done():
+                    pending.future.set_exception(RuntimeError("LLM interface closed"))
+            self._batch_task = None
+            self._batch_queue = None
+        
         if self.session and not self.session.closed:
             await self.session.close()
     
     async def search_tools(
         self,
         query: str,
-        tools: List[ToolDefinition],
+        tools: Sequence[ToolDefinition],
         limit: int = 5
     ) -> ToolSearchResult:
         """
@@ -34,7 +340,7 @@ class LLMInterface:
         
         Args:
             query: The user's query
-            tools: List of available tools
+            tools: Available tools, as a list or a prebuilt ToolIndex
             limit: Maximum number of tools to return
             
         Returns:
@@ -46,72 +352,232 @@ class LLMInterface:
         # If we have a small number of tools, just return them all
         if len(tools) <= limit:
             return ToolSearchResult(
-                tools=tools,
+                tools=list(tools),
                 confidence_scores={tool.name: 1.0 for tool in tools}
             )
         
-        # Prepare the prompt for the LLM
-        tools_json = [
-            {
-                "name": tool.name,
-                "description": tool.description,
-                "parameters": {
-                    name: {"type": param.type, "description": param.description}
-                    for name, param in tool.parameters.items()
-                },
-                "return_type": tool.return_type,
-                "server_name": tool.server_name
-            }
-            for tool in tools
-        ]
+        # Serve paraphrases of earlier queries from the semantic cache
+        embedding = await self._lookup_embedding(query, tools)
+        if embedding is not None:
+            cached = self.semantic_cache.lookup(embedding, limit)
+            if cached is not None:
+                return cached
         
-        prompt = self._create_search_prompt(query, tools_json, limit)
+        # Only send the LLM the tools whose embeddings are closest to the query,
+        # but never fewer than were asked for
+        candidates = tools
+        shortlist_size = max(settings.TOOL_ANN_CANDIDATES, limit)
+        if (
+            embedding is not None
+            and isinstance(tools, ToolIndex)
+            and tools.embeddings is not None
+            and len(tools) > shortlist_size
+        ):
+            candidates = tools.nearest(embedding, shortlist_size)
         
         try:
-            # Call the local LLM
-            response = await self._call_llm(prompt)
-            
-            # Parse the response to get the ranked tool names
-            ranked_tools = self._parse_llm_response(response)
-            
-            # Map back to ToolDefinition objects
+            ranked_tools = await self._rank_tools(query, candidates, limit, id(tools))
+            result = self._build_result(ranked_tools, candidates, limit)
+        except Exception as e:
+            logger.error(f"Error searching tools with LLM: {e}")
+            # Fallback to simple substring matching if LLM fails
+            return self._fallback_search(query, tools, limit)
+        
+        # Only cache real rankings: an unparseable or empty LLM reply yields a
+        # padded placeholder result. A newer tool snapshot may also have
+        # replaced this one while ranking.
+        ranked_names = {name for name, _ in ranked_tools}
+        if (
+            embedding is not None
+            and tools is self._cached_tools
+            and any(tool.name in ranked_names for tool in result.tools)
+        ):
+            self.semantic_cache.insert(embedding, result, limit)
+        return result
+    
+    async def _rank_tools(
+        self,
+        query: str,
+        tools: Sequence[ToolDefinition],
+        limit: int,
+        catalog_id: int
+    ) -> List[Tuple[str, float]]:
+        """Rank tools for the query, batched with concurrent queries if enabled."""
+        if self._batch_task is None:
+            return await self._rank_single(query, tools, limit)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._batch_queue.put_nowait(
+            _PendingSearch(query, tools, limit, future, catalog_id)
+        )
+        return await future
+    
+    async def _rank_single(
+        self,
+        query: str,
+        tools: Sequence[ToolDefinition],
+        limit: int
+    ) -> List[Tuple[str, float]]:
+        """Rank tools for a single query with one LLM call."""
+        prompt = self._create_search_prompt(query, self._tools_json(tools), limit)
+        response = await self._call_llm(prompt)
+        return self._parse_llm_response(response)
+    
+    def _build_result(
+        self,
+        ranked_tools: List[Tuple[str, float]],
+        tools: Sequence[ToolDefinition],
+        limit: int
+    ) -> ToolSearchResult:
+        """Map ranked tool names back to ToolDefinition objects."""
+        if isinstance(tools, ToolIndex):
+            tool_map = tools.by_name
+        else:
             tool_map = {tool.name: tool for tool in tools}
-            result_tools = []
-            confidence_scores = {}
-            
-            for i, (tool_name, score) in enumerate(ranked_tools):
-                if tool_name in tool_map:
-                    result_tools.append(tool_map[tool_name])
-                    confidence_scores[tool_name] = score
-                    
-                    if len(result_tools) >= limit:
+        result_tools = []
+        confidence_scores = {}
+        
+        for tool_name, score in ranked_tools:
+            if tool_name in tool_map:
+                result_tools.append(tool_map[tool_name])
+                confidence_scores[tool_name] = score
+                
+                if len(result_tools) >= limit:
+                    break
+        
+        # If we didn't get enough tools, add some random ones
+        if len(result_tools) < limit:
+            remaining = limit - len(result_tools)
+            for tool in tools:
+                if tool.name not in confidence_scores:
+                    result_tools.append(tool)
+                    confidence_scores[tool.name] = 0.5  # Low confidence
+                    remaining -= 1
+                    if remaining <= 0:
                         break
+        
+        return ToolSearchResult(
+            tools=result_tools,
+            confidence_scores=confidence_scores
+        )
+    
+    async def _batch_worker(self):
+        """Collect queued queries into batches and dispatch each batch."""
+        while True:
+            batch = await self._next_batch()
             
-            # If we didn't get enough tools, add some random ones
-            if len(result_tools) < limit:
-                remaining = limit - len(result_tools)
-                for tool in tools:
-                    if tool.name not in confidence_scores:
-                        result_tools.append(tool)
-                        confidence_scores[tool.name] = 0.5  # Low confidence
-                        remaining -= 1
-                        if remaining <= 0:
-                            break
-            
-            return ToolSearchResult(
-                tools=result_tools,
-                confidence_scores=confidence_scores
-            )
+            # Queries can only share a prompt if they search the same tools
+            groups: Dict[int, List[_PendingSearch]] = {}
+            for pending in batch:
+                groups.setdefault(pending.catalog_id, []).append(pending)
             
+            for group in groups.values():
+                task = asyncio.create_task(self._run_batch(group))
+                self._inflight_batches.add(task)
+                task.add_done_callback(self._inflight_batches.discard)
+    
+    async def _next_batch(self) -> List[_PendingSearch]:
+        """
+        Wait for the next batch of queued queries.
+        
+        When no batch is in flight the queued queries are dispatched at once;
+        otherwise more queries are collected for up to LLM_BATCH_WINDOW seconds.
+        """
+        batch = [await self._batch_queue.get()]
+        
+        if not self._inflight_batches:
+            while not self._batch_queue.empty() and len(batch) < settings.LLM_BATCH_MAX_SIZE:
+                batch.append(self._batch_queue.get_nowait())
+            return batch
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.LLM_BATCH_WINDOW
+        while len(batch) < settings.LLM_BATCH_MAX_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._batch_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _run_batch(self, batch: List[_PendingSearch]):
+        """Rank a batch of queries over the same tools and resolve their futures."""
+        try:
+            if len(batch) == 1:
+                pending = batch[0]
+                results = [await self._rank_single(pending.query, pending.tools, pending.limit)]
+            else:
+                # Shortlisted queries are ranked against the union of their candidates
+                tools = batch[0].tools
+                if any(pending.tools is not tools for pending in batch):
+                    union = {}
+                    for pending in batch:
+                        for tool in pending.tools:
+                            union.setdefault(tool.name, tool)
+                    tools = list(union.values())
+                
+                prompt = self._create_batch_search_prompt(
+                    [(i, pending.query, pending.limit) for i, pending in enumerate(batch)],
+                    self._tools_json(tools)
+                )
+                response = await self._call_llm(prompt)
+                ranked_by_id = self._parse_batch_response(response)
+                results = [ranked_by_id.get(i, []) for i in range(len(batch))]
+        except asyncio.CancelledError:
+            self._fail_batch(batch, RuntimeError("LLM interface closed"))
+            raise
         except Exception as e:
-            logger.error(f"Error searching tools with LLM: {e}")
-            # Fallback to simple substring matching if LLM fails
-            return self._fallback_search(query, tools, limit)
+            self._fail_batch(batch, e)
+            return
+        
+        for pending, ranked_tools in zip(batch, results):
+            if not pending.future.done():
+                pending.future.set_result(ranked_tools)
     
-    def _create_search_prompt(self, query: str, tools: List[Dict], limit: int) -> str:
-        """Create a prompt for the LLM to rank tools based on the query."""
-        tools_json = json.dumps(tools, indent=2)
+    def _fail_batch(self, batch: List[_PendingSearch], error: Exception):
+        """Propagate an error to every query still waiting in the batch."""
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_exception(error)
+    
+    async def _lookup_embedding(
+        self,
+        query: str,
+        tools: Sequence[ToolDefinition]
+    ) -> Optional[np.ndarray]:
+        """
+        Embed the query for a semantic cache lookup.
+        
+        Cached results are only valid for the tool set they were ranked
+        against, so the cache is cleared whenever a different one is passed.
+        ToolDiscovery builds a new ToolIndex on every tool change, so the
+        identity check catches rediscovered tools without hashing them. The
+        encoder's forward pass is CPU-bound, so it runs in the default
+        executor instead of blocking the event loop.
+        
+        Returns:
+            The normalized query embedding, or None if no encoder is loaded
+        """
+        if self.encoder is None:
+            return None
         
+        if tools is not self._cached_tools:
+            self.semantic_cache.clear()
+            self._cached_tools = tools
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.encoder.encode, query)
+    
+    def _tools_json(self, tools: Sequence[ToolDefinition]) -> str:
+        """Get the tools serialized for the LLM prompt, reusing an index's copy."""
+        if isinstance(tools, ToolIndex):
+            return tools.tools_json
+        return serialize_tools(tools)
+    
+    def _create_search_prompt(self, query: str, tools_json: str, limit: int) -> str:
+        """Create a prompt for the LLM to rank tools based on the query."""
         return f"""You are a tool discovery assistant. Your task is to find the most relevant tools for a user's query from a list of available tools.
 
 Available tools (in JSON format):
@@ -127,39 +593,103 @@ Example format:
   {{"name": "tool_name_2", "confidence": 0.85}}
 ]
 
+Your response (JSON array only, no other text):"""
+
+    def _create_batch_search_prompt(
+        self,
+        queries: List[Tuple[int, str, int]],
+        tools_json: str
+    ) -> str:
+        """Create a prompt for the LLM to rank tools for several queries at once."""
+        queries_json = orjson.dumps(
+            [{"id": query_id, "query": query, "limit": limit} for query_id, query, limit in queries],
+            option=orjson.OPT_INDENT_2
+        ).decode("utf-8")
+        
+        return f"""You are a tool discovery assistant. Your task is to find the most relevant tools for each of several user queries from a list of available tools.
+
+Available tools (in JSON format):
+{tools_json}
+
+User queries (in JSON format):
+{queries_json}
+
+For each query, return the top "limit" most relevant tools, ordered by relevance. For each tool, include the tool name and a confidence score between 0 and 1.
+
+Example format:
+[
+  {{"id": 0, "tools": [{{"name": "tool_name_1", "confidence": 0.95}}]}},
+  {{"id": 1, "tools": [{{"name": "tool_name_2", "confidence": 0.85}}]}}
+]
+
 Your response (JSON array only, no other text):"""
 
     def _parse_llm_response(self, response: str) -> List[Tuple[str, float]]:
         """Parse the LLM response to extract tool names and confidence scores."""
+        if not response.lstrip().startswith("["):
+            logger.warning("Failed to parse LLM response: expected a JSON array")
+            return []
+        
         try:
-            # Try to parse the response as JSON
-            data = json.loads(response.strip())
-            if not isinstance(data, list):
-                raise ValueError("Expected a JSON array")
-                
-            # Extract tool names and confidence scores
-            return [
-                (item["name"], float(item["confidence"]))
-                for item in data
-                if isinstance(item, dict) and "name" in item and "confidence" in item
-            ]
-        except (json.JSONDecodeError, ValueError, KeyError) as e:
+            return [(item.name, item.confidence) for item in _rank_decoder.decode(response)]
+        except msgspec.ValidationError:
+            # Valid JSON with some malformed items; keep the well-formed ones
+            return self._ranked_items(orjson.loads(response))
+        except msgspec.DecodeError as e:
             logger.warning(f"Failed to parse LLM response: {e}")
             return []
     
+    def _parse_batch_response(self, response: str) -> Dict[int, List[Tuple[str, float]]]:
+        """Parse a batched LLM response into ranked tools per query id."""
+        if not response.lstrip().startswith("["):
+            logger.warning("Failed to parse batched LLM response: expected a JSON array")
+            return {}
+        
+        try:
+            return {
+                entry.id: [(item.name, item.confidence) for item in entry.tools]
+                for entry in _batch_rank_decoder.decode(response)
+            }
+        except msgspec.ValidationError:
+            ranked_by_id = {}
+            for entry in orjson.loads(response):
+                if isinstance(entry, dict) and isinstance(entry.get("tools"), list):
+                    try:
+                        ranked_by_id[int(entry["id"])] = self._ranked_items(entry["tools"])
+                    except (KeyError, TypeError, ValueError):
+                        continue
+            return ranked_by_id
+        except msgspec.DecodeError as e:
+            logger.warning(f"Failed to parse batched LLM response: {e}")
+            return {}
+    
+    def _ranked_items(self, items: Any) -> List[Tuple[str, float]]:
+        """Extract (name, confidence) pairs from loosely shaped ranking items."""
+        if not isinstance(items, list):
+            return []
+        
+        ranked = []
+        for item in items:
+            if isinstance(item, dict) and "name" in item and "confidence" in item:
+                try:
+                    ranked.append((item["name"], float(item["confidence"])))
+                except (TypeError, ValueError):
+                    continue
+        return ranked
+    
     async def _call_llm(self, prompt: str) -> str:
         """Make an API call to the local LLM."""
         if not self.session:
             await self.initialize()
         
-        payload = {
-            "prompt": prompt,
-            "max_tokens": settings.MAX_TOKENS,
-            "temperature": settings.TEMPERATURE,
-        }
+        payload = b'{"prompt":' + orjson.dumps(prompt) + b"," + self._payload_tail
         
         try:
-            async with self.session.post(self.endpoint, json=payload) as response:
+            async with self.session.post(
+                self.endpoint,
+                data=payload,
+                headers=_JSON_HEADERS
+            ) as response:
                 response.raise_for_status()
                 result = await response.json()
                 return result.get("text", "").strip()
@@ -170,42 +700,15 @@ Your response (JSON array only, no other text):"""
     def _fallback_search(
         self,
         query: str,
-        tools: List[ToolDefinition],
+        tools: Sequence[ToolDefinition],
         limit: int
     ) -> ToolSearchResult:
         """Fallback search implementation when LLM is not available."""
         # Simple substring matching as fallback
-        query = query.lower()
-        scored_tools = []
-        
-        for tool in tools:
-            score = 0.0
-            
-            # Check name
-            if query in tool.name.lower():
-                score += 0.6
-            
-            # Check description
-            if query in tool.description.lower():
-                score += 0.3
-            
-            # Check parameter descriptions
-            for param in tool.parameters.values():
-                if query in param.description.lower():
-                    score += 0.1
-                    break
-            
-            if score > 0:
-                scored_tools.append((tool, score))
-        
-        # Sort by score (highest first)
-        scored_tools.sort(key=lambda x: x[1], reverse=True)
-        
-        # Take top N
-        result_tools = [tool for tool, _ in scored_tools[:limit]]
-        confidence_scores = {tool.name: score for tool, score in scored_tools[:limit]}
+        index = tools if isinstance(tools, ToolIndex) else ToolIndex(tools)
+        scored_tools = index.top_k(query, limit)
         
         return ToolSearchResult(
-            tools=result_tools,
-            confidence_scores=confidence_scores
+            tools=[tool for tool, _ in scored_tools],
+            confidence_scores={tool.name: score for tool, score in scored_tools}
         )
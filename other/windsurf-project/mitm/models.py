@@ -1,5 +1,8 @@
-from pydantic import BaseModel, Field
-from typing import Dict, Any, List, Optional
+import msgspec
+import orjson
+from functools import lru_cache
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+from typing import Dict, Any, List, Literal, Optional, Tuple, Union
 from enum import Enum
 
 class ToolType(str, Enum):
@@ -13,13 +16,122 @@ class ParameterSchema(BaseModel):
     default: Any = None
     enum: Optional[List[Any]] = None
 
+# Python types that parameter values are validated against, by schema type
+PARAMETER_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": float,
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+# Schema of one parameter as seen by the validator: name, type, required, enum
+_ParameterSpec = Tuple[str, str, bool, Optional[Tuple[Any, ...]]]
+
+def _parameter_spec(name: str, param: ParameterSchema) -> _ParameterSpec:
+    """Reduce a parameter schema to the hashable parts its validator checks."""
+    enum = None
+    if param.enum and all(isinstance(v, (str, int)) and not isinstance(v, bool) for v in param.enum):
+        enum = tuple(param.enum)
+    return (name, param.type, param.required, enum)
+
+@lru_cache(maxsize=None)
+def _compile_parameters(specs: Tuple[_ParameterSpec, ...]) -> type:
+    """
+    Compile parameter specs into a msgspec struct type.
+    
+    Tools with identical schemas share one compiled type.
+    """
+    fields = []
+    for i, (name, type_name, required, enum) in enumerate(specs):
+        param_type = Literal[enum] if enum else PARAMETER_TYPES.get(type_name, Any)
+        if required:
+            fields.append((f"p{i}", param_type, msgspec.field(name=name)))
+        else:
+            fields.append((
+                f"p{i}",
+                Union[param_type, msgspec.UnsetType],
+                msgspec.field(name=name, default=msgspec.UNSET)
+            ))
+    return msgspec.defstruct("Parameters", fields, kw_only=True)
+
 class ToolDefinition(BaseModel):
+    # Frozen so the values cached below can't go stale
+    model_config = ConfigDict(frozen=True)
+    
     name: str
     description: str
     parameters: Dict[str, ParameterSchema]
     server_name: str
     tool_type: ToolType
     return_type: str = "Any"
+    
+    # Lowercased copies of the searchable fields, computed on first use
+    _name_lc: Optional[str] = PrivateAttr(default=None)
+    _description_lc: Optional[str] = PrivateAttr(default=None)
+    _param_descs_lc: Optional[Tuple[str, ...]] = PrivateAttr(default=None)
+    # Serialized API representation, computed on first use
+    _json_bytes: Optional[bytes] = PrivateAttr(default=None)
+    # msgspec struct type checking call parameters, see compile_validator
+    _params_struct: Optional[type] = PrivateAttr(default=None)
+    
+    @property
+    def name_lc(self) -> str:
+        if self._name_lc is None:
+            self._name_lc = self.name.lower()
+        return self._name_lc
+    
+    @property
+    def description_lc(self) -> str:
+        if self._description_lc is None:
+            self._description_lc = self.description.lower()
+        return self._description_lc
+    
+    @property
+    def param_descs_lc(self) -> Tuple[str, ...]:
+        if self._param_descs_lc is None:
+            self._param_descs_lc = tuple(
+                param.description.lower() for param in self.parameters.values()
+            )
+        return self._param_descs_lc
+    
+    @property
+    def json_bytes(self) -> bytes:
+        if self._json_bytes is None:
+            self._json_bytes = orjson.dumps(self.model_dump())
+        return self._json_bytes
+    
+    def model_copy(self, *, update: Optional[Dict[str, Any]] = None, deep: bool = False) -> "ToolDefinition":
+        """Copy the tool, leaving the copy to recompute its cached values."""
+        copied = super().model_copy(update=update, deep=deep)
+        for name in self.__private_attributes__:
+            setattr(copied, name, None)
+        return copied
+    
+    def compile_validator(self) -> type:
+        """
+        Compile the msgspec struct type that validates call parameters.
+        
+        The type is compiled once and cached on the tool; later calls return it.
+        """
+        if self._params_struct is None:
+            self._params_struct = _compile_parameters(tuple(
+                _parameter_spec(name, param) for name, param in self.parameters.items()
+            ))
+        return self._params_struct
+    
+    def validate_parameters(self, parameters: Dict[str, Any]):
+        """
+        Check call parameters against this tool's schema.
+        
+        Unknown parameters are allowed; parameters of an unrecognized type
+        accept any value.
+        
+        Raises:
+            msgspec.ValidationError: If a parameter is missing or invalid
+        """
+        msgspec.convert(parameters, self.compile_validator())
 
 class ToolSearchResult(BaseModel):
     tools: List[ToolDefinition]
@@ -40,3 +152,25 @@ class ServerInfo(BaseModel):
     description: str
     version: str
     tools_count: int
+
+
+# Wire formats of MCP server responses, decoded with msgspec
+class MCPParameterSchema(msgspec.Struct):
+    type: str = "string"
+    description: str = ""
+    required: bool = True
+    enum: Optional[List[Any]] = None
+
+class MCPToolSchema(msgspec.Struct):
+    name: str
+    description: str = ""
+    parameters: Dict[str, MCPParameterSchema] = msgspec.field(default_factory=dict)
+
+# Wire formats of local LLM ranking responses
+class RankItem(msgspec.Struct):
+    name: str
+    confidence: float
+
+class RankedQuery(msgspec.Struct):
+    id: int
+    tools: List[RankItem]
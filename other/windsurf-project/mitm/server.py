@@ -1,11 +1,14 @@
 import logging
 import asyncio
-from typing import Dict, List, Optional, Any
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Any
 from fastapi import FastAPI, HTTPException, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from pydantic import ValidationError
+import msgspec
+import orjson
 
 from .models import (
     ToolDefinition,
@@ -25,11 +28,46 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize shared services on startup and clean them up on shutdown."""
+    logger.info("Starting Model in the Middle (MitM) server...")
+    
+    # Initialize LLM interface
+    await llm_interface.initialize()
+    
+    # Shortlist tools by embedding similarity when an encoder is available
+    if llm_interface.encoder is not None:
+        tool_discovery.embed_tools(llm_interface.encoder)
+    
+    # Start tool discovery
+    await tool_discovery.start()
+    
+    # Register some example MCP servers
+    await tool_discovery.register_server(
+        "paperless-ngx",
+        "Document management system with OCR and tagging"
+    )
+    
+    logger.info("MitM server started successfully")
+    yield
+    logger.info("Shutting down MitM server...")
+    
+    # Stop tool discovery
+    await tool_discovery.stop()
+    
+    # Close LLM interface
+    await llm_interface.close()
+    
+    logger.info("MitM server shutdown complete")
+
 # Create FastAPI app
 app = FastAPI(
     title="Model in the Middle (MitM)",
     description="A minimalist framework for MCP server interfaces using local LLMs",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -45,17 +83,38 @@ app.add_middleware(
 tool_discovery = ToolDiscovery(settings)
 llm_interface = LLMInterface()
 
+def _json_response(content: bytes) -> Response:
+    """Wrap already-serialized JSON, skipping response model validation."""
+    return Response(content=content, media_type="application/json")
+
+def _json_array(items: Iterable[bytes]) -> bytes:
+    """Join serialized JSON values into a JSON array."""
+    return b"[" + b",".join(items) + b"]"
+
+# Pages with more tools than this are streamed instead of joined in memory
+STREAM_THRESHOLD = 1000
+# Number of serialized tools sent per streamed chunk
+STREAM_CHUNK_SIZE = 256
+
+async def _stream_json_array(items: List[bytes]) -> AsyncIterator[bytes]:
+    """Yield a JSON array of serialized values in chunks of ``STREAM_CHUNK_SIZE``."""
+    yield b"["
+    for start in range(0, len(items), STREAM_CHUNK_SIZE):
+        chunk = b",".join(items[start:start + STREAM_CHUNK_SIZE])
+        yield chunk if start == 0 else b"," + chunk
+    yield b"]"
+
 # Exception handlers
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={"detail": exc.errors()},
     )
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
     )
@@ -63,73 +122,40 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Internal server error"},
     )
 
-# Startup and shutdown events
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the application."""
-    logger.info("Starting Model in the Middle (MitM) server...")
-    
-    # Initialize LLM interface
-    await llm_interface.initialize()
-    
-    # Start tool discovery
-    await tool_discovery.start()
-    
-    # Register some example MCP servers
-    await tool_discovery.register_server(
-        "paperless-ngx",
-        "Document management system with OCR and tagging"
-    )
-    
-    logger.info("MitM server started successfully")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Clean up resources on shutdown."""
-    logger.info("Shutting down MitM server...")
-    
-    # Stop tool discovery
-    await tool_discovery.stop()
-    
-    # Close LLM interface
-    await llm_interface.close()
-    
-    logger.info("MitM server shutdown complete")
-
 # API Endpoints
+_ROOT_JSON = orjson.dumps({
+    "name": "Model in the Middle (MitM)",
+    "description": "A minimalist framework for MCP server interfaces using local LLMs",
+    "version": "0.1.0",
+    "documentation": "/docs"
+})
+_HEALTH_JSON = orjson.dumps({"status": "healthy"})
+
 @app.get("/", response_model=Dict[str, str])
 async def root():
     """Root endpoint with basic information about the service."""
-    return {
-        "name": "Model in the Middle (MitM)",
-        "description": "A minimalist framework for MCP server interfaces using local LLMs",
-        "version": "0.1.0",
-        "documentation": "/docs"
-    }
+    return _json_response(_ROOT_JSON)
 
 @app.get("/servers", response_model=List[ServerInfo])
 async def list_servers():
     """List all registered MCP servers."""
-    return [
-        {
-            "name": server.name,
-            "description": server.description,
-            "version": "1.0.0",  # TODO: Get actual version from server
-            "tools_count": len(server.tools)
-        }
-        for server in tool_discovery.servers.values()
-    ]
+    return _json_response(
+        _json_array(server.info_json for server in tool_discovery.servers.values())
+    )
 
 @app.get("/tools", response_model=List[ToolDefinition])
 async def list_tools(limit: int = 100, offset: int = 0):
     """List all available tools."""
-    all_tools = tool_discovery.get_all_tools()
-    return all_tools[offset:offset + limit]
+    page = tool_discovery.get_tools_page(offset, limit)
+    items = [tool.json_bytes for tool in page]
+    if len(items) > STREAM_THRESHOLD:
+        return StreamingResponse(_stream_json_array(items), media_type="application/json")
+    return _json_response(_json_array(items))
 
 @app.get("/tools/search", response_model=ToolSearchResult)
 async def search_tools(
@@ -151,24 +177,21 @@ async def search_tools(
             detail="Search query cannot be empty"
         )
     
-    all_tools = tool_discovery.get_all_tools()
+    all_tools = await tool_discovery.get_search_index()
     
     # Use the LLM to find the most relevant tools
     search_result = await llm_interface.search_tools(q, all_tools, limit)
     
     # Filter by minimum confidence
-    filtered_tools = []
-    filtered_scores = {}
-    
-    for tool in search_result.tools:
-        confidence = search_result.confidence_scores.get(tool.name, 0)
-        if confidence >= min_confidence:
-            filtered_tools.append(tool)
-            filtered_scores[tool.name] = confidence
-    
-    return ToolSearchResult(
-        tools=filtered_tools,
-        confidence_scores=filtered_scores
+    scores = search_result.confidence_scores
+    filtered = [
+        (tool, confidence) for tool in search_result.tools
+        if (confidence := scores.get(tool.name, 0)) >= min_confidence
+    ]
+    
+    return _json_response(
+        b'{"tools":' + _json_array(tool.json_bytes for tool, _ in filtered)
+        + b',"confidence_scores":' + orjson.dumps({tool.name: c for tool, c in filtered}) + b"}"
     )
 
 @app.get("/tools/{tool_name}", response_model=ToolDefinition)
@@ -180,7 +203,7 @@ async def get_tool(tool_name: str):
             status_code=404,
             detail=f"Tool '{tool_name}' not found"
         )
-    return tool
+    return _json_response(tool.json_bytes)
 
 @app.post("/execute", response_model=ToolExecutionResponse)
 async def execute_tool(request: ToolExecutionRequest):
@@ -197,8 +220,14 @@ async def execute_tool(request: ToolExecutionRequest):
             detail=f"Tool '{request.tool_name}' not found"
         )
     
-    # TODO: Validate parameters against the tool's schema
-    # For now, just log the execution
+    try:
+        tool.validate_parameters(request.parameters)
+    except msgspec.ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid parameters for tool '{tool.name}': {e}"
+        )
+    
     logger.info(
         f"Executing tool: {tool.name} with parameters: {request.parameters}"
     )
@@ -219,7 +248,7 @@ async def execute_tool(request: ToolExecutionRequest):
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy"}
+    return _json_response(_HEALTH_JSON)
 
 # Main entry point
 if __name__ == "__main__":
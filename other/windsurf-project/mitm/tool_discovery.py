@@ -1,33 +1,90 @@
 import asyncio
 import json
 import logging
-from typing import Dict, List, Optional, Any
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
+import numpy as np
+import orjson
+
+from . import __version__
 from .models import ToolDefinition, ParameterSchema, ToolType
+from .tool_index import ToolIndex
 
 logger = logging.getLogger(__name__)
 
+# Drop the per-instance __dict__ where dataclasses support it (Python 3.10+)
+_DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class MCPServer:
     name: str
     description: str = ""
     tools: Dict[str, ToolDefinition] = field(default_factory=dict)
-    last_updated: Optional[datetime] = None
+    # time.monotonic_ns() of the last discovery; cheap to stamp on every pass
+    updated_ns: Optional[int] = None
+    # ServerInfo JSON and the (description, tool count) it was built from
+    _info: Optional[Tuple[Tuple[str, int], bytes]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    
+    @property
+    def info_json(self) -> bytes:
+        """This server's ServerInfo as JSON, rebuilt only when it would change."""
+        key = (self.description, len(self.tools))
+        if self._info is None or self._info[0] != key:
+            self._info = (key, orjson.dumps({
+                "name": self.name,
+                "description": self.description,
+                "version": "1.0.0",  # TODO: Get actual version from server
+                "tools_count": len(self.tools)
+            }))
+        return self._info[1]
+    
+    @property
+    def last_updated(self) -> Optional[datetime]:
+        """UTC time of the last discovery, computed only when someone asks."""
+        if self.updated_ns is None:
+            return None
+        elapsed_us = (time.monotonic_ns() - self.updated_ns) // 1000
+        return datetime.now(timezone.utc) - timedelta(microseconds=elapsed_us)
+
+def _embedding_text(tool: ToolDefinition) -> str:
+    """The text a tool is embedded from."""
+    return f"{tool.name}: {tool.description}"
 
 class ToolDiscovery:
     def __init__(self, settings):
         self.settings = settings
         self.servers: Dict[str, MCPServer] = {}
+        self._tool_by_name: Dict[str, ToolDefinition] = {}
+        self._all_tools: Optional[List[ToolDefinition]] = None
+        self._index: Optional[ToolIndex] = None
+        # The index being encoded by get_search_index and the task encoding it
+        self._embedding: Optional[Tuple[ToolIndex, asyncio.Task]] = None
+        self._encoder = None
+        self._embedding_cache: Dict[str, np.ndarray] = {}
+        # Tools read from TOOL_DISCOVERY_CACHE_PATH that no registered server
+        # has claimed yet: server name -> (wall-clock discovery time, tools)
+        self._discovery_cache: Dict[str, Tuple[float, Dict[str, ToolDefinition]]] = {}
         self._discovery_task: Optional[asyncio.Task] = None
         self._stop_event = asyncio.Event()
     
     async def start(self):
         """Start the periodic tool discovery task."""
-        self._stop_event.clear()
-        self._discovery_task = asyncio.create_task(self._periodic_discovery())
+        self._load_discovery_cache()
+        # A fresh event binds to the running loop, so the app can be restarted
+        # on a new loop (as each test client does)
+        self._stop_event = asyncio.Event()
+        # Cached tools are fresh, so the first pass can wait a full interval
+        self._discovery_task = asyncio.create_task(
+            self._periodic_discovery(skip_first=bool(self._discovery_cache))
+        )
     
     async def stop(self):
         """Stop the periodic tool discovery."""
@@ -39,13 +96,16 @@ class ToolDiscovery:
             except asyncio.CancelledError:
                 pass
     
-    async def _periodic_discovery(self):
+    async def _periodic_discovery(self, skip_first: bool = False):
         """Periodically discover tools from all registered MCP servers."""
+        skip = skip_first
         while not self._stop_event.is_set():
-            try:
-                await self.discover_all_servers()
-            except Exception as e:
-                logger.error(f"Error during tool discovery: {e}")
+            if not skip:
+                try:
+                    await self.discover_all_servers()
+                except Exception as e:
+                    logger.error(f"Error during tool discovery: {e}")
+            skip = False
             
             try:
                 await asyncio.wait_for(
@@ -62,7 +122,17 @@ class ToolDiscovery:
             return False
         
         self.servers[server_name] = MCPServer(name=server_name, description=description)
-        await self.discover_server_tools(server_name)
+        
+        cached = self._discovery_cache.pop(server_name, None)
+        if cached is not None:
+            discovered_at, tools = cached
+            self.set_server_tools(server_name, tools)
+            self.servers[server_name].updated_ns -= int((time.time() - discovered_at) * 1e9)
+            logger.info(f"Loaded {len(tools)} cached tools for server {server_name}")
+        else:
+            await self.discover_server_tools(server_name)
+        
+        self._save_discovery_cache()
         return True
     
     async def unregister_server(self, server_name: str) -> bool:
@@ -70,19 +140,28 @@ class ToolDiscovery:
         if server_name not in self.servers:
             return False
         
-        del self.servers[server_name]
+        self._update_names(self.servers.pop(server_name).tools, {})
+        self._invalidate()
         return True
     
     async def discover_all_servers(self) -> Dict[str, bool]:
         """Discover tools from all registered servers."""
+        server_names = list(self.servers.keys())
+        outcomes = await asyncio.gather(
+            *(self.discover_server_tools(server_name) for server_name in server_names),
+            return_exceptions=True
+        )
+        
         results = {}
-        for server_name in list(self.servers.keys()):
-            try:
-                success = await self.discover_server_tools(server_name)
-                results[server_name] = success
-            except Exception as e:
-                logger.error(f"Error discovering tools for server {server_name}: {e}")
+        for server_name, outcome in zip(server_names, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Error discovering tools for server {server_name}: {outcome}")
                 results[server_name] = False
+            else:
+                results[server_name] = outcome
+        
+        if results:
+            self._save_discovery_cache()
         return results
     
     async def discover_server_tools(self, server_name: str) -> bool:
@@ -138,42 +217,252 @@ class ToolDiscovery:
         )
         
         # Update the server with discovered tools
-        self.servers[server_name].tools = tools
-        self.servers[server_name].last_updated = datetime.utcnow()
+        self.set_server_tools(server_name, tools)
         
         logger.info(f"Discovered {len(tools)} tools from server {server_name}")
         return True
     
+    def set_server_tools(self, server_name: str, tools: Dict[str, ToolDefinition]):
+        """Replace the tools of a registered server with newly discovered ones."""
+        server = self.servers[server_name]
+        # Compile parameter validators now rather than on the first execute call
+        for tool in tools.values():
+            tool.compile_validator()
+        old_tools = server.tools
+        server.tools = tools
+        server.updated_ns = time.monotonic_ns()
+        self._update_names(old_tools, tools)
+        self._invalidate()
+    
+    def _update_names(self, old_tools: Dict[str, ToolDefinition], new_tools: Dict[str, ToolDefinition]):
+        """
+        Update the name lookup after a server's tools change from old to new.
+        
+        A name provided by several servers resolves to the first registered
+        one; the servers are only scanned for names that such a server held
+        or that another server also provides.
+        """
+        for name in old_tools.keys() | new_tools.keys():
+            current = self._tool_by_name.get(name)
+            if current is not None and current is not old_tools.get(name):
+                # Held by another server, which may have been registered first
+                if name in new_tools:
+                    self._resolve_name(name)
+            elif name in new_tools:
+                self._tool_by_name[name] = new_tools[name]
+            else:
+                self._resolve_name(name)
+    
+    def _resolve_name(self, name: str):
+        """Point a tool name at the first registered server providing it."""
+        for server in self.servers.values():
+            tool = server.tools.get(name)
+            if tool is not None:
+                self._tool_by_name[name] = tool
+                return
+        self._tool_by_name.pop(name, None)
+    
+    def _invalidate(self):
+        """Drop the cached tool list and index after the set of tools changes."""
+        self._all_tools = None
+        self._index = None
+    
     def get_tool(self, tool_name: str) -> Optional[ToolDefinition]:
         """Get a specific tool by name."""
-        for server in self.servers.values():
-            if tool_name in server.tools:
-                return server.tools[tool_name]
-        return None
+        return self._tool_by_name.get(tool_name)
     
     def search_tools(self, query: str, limit: int = 10) -> List[ToolDefinition]:
         """Search for tools matching the query."""
         # TODO: Implement semantic search using the local LLM
         # For now, just do a simple case-insensitive substring match
-        query = query.lower()
-        results = []
+        return self.get_index().match(query, limit)
+    
+    def get_all_tools(self) -> List[ToolDefinition]:
+        """
+        Get all available tools from all servers.
         
-        for server in self.servers.values():
-            for tool in server.tools.values():
-                if (query in tool.name.lower() or 
-                    query in tool.description.lower() or
-                    any(query in param.description.lower() 
-                        for param in tool.parameters.values())):
-                    results.append(tool)
-                    if len(results) >= limit:
-                        return results
+        The list is cached until the set of tools changes; callers must not
+        modify it.
+        """
+        if self._all_tools is None:
+            self._all_tools = [
+                tool
+                for server in self.servers.values()
+                for tool in server.tools.values()
+            ]
+        return self._all_tools
+    
+    def get_tools_page(self, offset: int, limit: int) -> List[ToolDefinition]:
+        """
+        Get one page of the available tools.
         
-        return results
+        Slices the cached tool list, so the cost is proportional to ``limit``
+        rather than to the total number of tools.
+        """
+        offset = max(offset, 0)
+        return self.get_all_tools()[offset:offset + max(limit, 0)]
     
-    def get_all_tools(self) -> List[ToolDefinition]:
-        """Get all available tools from all servers."""
-        return [
-            tool
-            for server in self.servers.values()
-            for tool in server.tools.values()
-        ]
+    def get_index(self) -> ToolIndex:
+        """
+        Get a search index over all available tools.
+        
+        The index is rebuilt on first use after the set of tools changes.
+        Tool embeddings are attached only if every tool is already in the
+        embedding cache; ``get_search_index`` encodes the missing ones.
+        """
+        if self._index is None:
+            tools = self.get_all_tools()
+            self._index = ToolIndex(tools, self._cached_embeddings(tools))
+        return self._index
+    
+    async def get_search_index(self) -> ToolIndex:
+        """
+        Get the search index with embeddings for every tool, if an encoder is set.
+        
+        New tools are encoded, and the embedding cache saved, in the default
+        executor so the event loop keeps serving other requests meanwhile.
+        Concurrent callers share one encoding of each index.
+        """
+        index = self.get_index()
+        if self._encoder is None or not index or index.embeddings is not None:
+            return index
+        
+        if self._embedding is None or self._embedding[0] is not index:
+            self._embedding = (index, asyncio.create_task(self._embed_index(index)))
+        # Shield the shared task so one cancelled caller doesn't cancel the rest
+        return await asyncio.shield(self._embedding[1])
+    
+    async def _embed_index(self, index: ToolIndex) -> ToolIndex:
+        """Encode an index's tools in the default executor and attach them."""
+        try:
+            loop = asyncio.get_running_loop()
+            embeddings = await loop.run_in_executor(None, self._embed, index.tools)
+            embedded = ToolIndex(index.tools, embeddings)
+            # Tools may have changed while encoding; never replace a newer index
+            if self._index is index:
+                self._index = embedded
+            return embedded
+        finally:
+            if self._embedding is not None and self._embedding[0] is index:
+                self._embedding = None
+    
+    def embed_tools(self, encoder):
+        """
+        Embed tool descriptions so searches can shortlist tools by similarity.
+        
+        Embeddings are cached by tool text, so later index rebuilds only encode
+        new or changed tools. If TOOL_EMBEDDING_CACHE_PATH is set, the cache is
+        loaded from and saved to that file.
+        
+        Args:
+            encoder: Sentence encoder shared with the LLM interface
+        """
+        self._encoder = encoder
+        
+        path = self.settings.TOOL_EMBEDDING_CACHE_PATH
+        if path and os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    self._embedding_cache = dict(zip(data["texts"].tolist(), data["vectors"]))
+            except Exception as e:
+                logger.warning(f"Failed to load tool embeddings from {path}: {e}")
+        
+        self._index = None
+    
+    def _cached_embeddings(self, tools: List[ToolDefinition]) -> Optional[np.ndarray]:
+        """Get the embedding of each tool if all of them are cached, else None."""
+        if self._encoder is None or not tools:
+            return None
+        texts = [_embedding_text(tool) for tool in tools]
+        if not all(text in self._embedding_cache for text in texts):
+            return None
+        return np.stack([self._embedding_cache[text] for text in texts])
+    
+    def _embed(self, tools: List[ToolDefinition]) -> np.ndarray:
+        """Get the embedding of each tool, encoding only tools not yet cached."""
+        texts = [_embedding_text(tool) for tool in tools]
+        missing = [text for text in dict.fromkeys(texts) if text not in self._embedding_cache]
+        
+        if missing:
+            vectors = self._encoder.encode_batch(missing)
+            cache = {text: self._embedding_cache[text] for text in texts if text in self._embedding_cache}
+            cache.update(zip(missing, vectors))
+            self._embedding_cache = cache
+            self._save_embeddings()
+        
+        return np.stack([self._embedding_cache[text] for text in texts])
+    
+    def _save_embeddings(self):
+        """Atomically write the embedding cache to TOOL_EMBEDDING_CACHE_PATH, if set."""
+        path = self.settings.TOOL_EMBEDDING_CACHE_PATH
+        if not path:
+            return
+        
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    texts=np.array(list(self._embedding_cache)),
+                    vectors=np.stack(list(self._embedding_cache.values()))
+                )
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to save tool embeddings to {path}: {e}")
+    
+    def _load_discovery_cache(self):
+        """
+        Read tools discovered by a previous run from TOOL_DISCOVERY_CACHE_PATH.
+        
+        Servers discovered longer than TOOL_DISCOVERY_INTERVAL ago are skipped,
+        as is a cache written by a different version of this package.
+        """
+        path = self.settings.TOOL_DISCOVERY_CACHE_PATH
+        if not path or not os.path.exists(path):
+            return
+        
+        try:
+            with open(path, "rb") as f:
+                data = orjson.loads(f.read())
+            if data.get("version") != __version__:
+                return
+            
+            now = time.time()
+            for server_name, entry in data["servers"].items():
+                discovered_at = entry["discovered_at"]
+                if now - discovered_at < self.settings.TOOL_DISCOVERY_INTERVAL:
+                    tools = {
+                        tool["name"]: ToolDefinition.model_validate(tool)
+                        for tool in entry["tools"]
+                    }
+                    self._discovery_cache[server_name] = (discovered_at, tools)
+        except Exception as e:
+            logger.warning(f"Failed to load discovered tools from {path}: {e}")
+    
+    def _save_discovery_cache(self):
+        """Atomically write discovered tools to TOOL_DISCOVERY_CACHE_PATH, if set."""
+        path = self.settings.TOOL_DISCOVERY_CACHE_PATH
+        if not path:
+            return
+        
+        servers = {
+            server_name: {
+                "discovered_at": discovered_at,
+                "tools": [tool.model_dump() for tool in tools.values()]
+            }
+            for server_name, (discovered_at, tools) in self._discovery_cache.items()
+        }
+        for server in self.servers.values():
+            if server.last_updated is not None:
+                servers[server.name] = {
+                    "discovered_at": server.last_updated.timestamp(),
+                    "tools": [tool.model_dump() for tool in server.tools.values()]
+                }
+        
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps({"version": __version__, "servers": servers}))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to save discovered tools to {path}: {e}")
@@ -0,0 +1,274 @@
+"""Precomputed search data for a snapshot of tool definitions."""
+from collections import defaultdict
+from collections.abc import Sequence
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import orjson
+
+from .models import ToolDefinition
+
+try:
+    from numba import njit
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+try:
+    import faiss
+    _FAISS_AVAILABLE = True
+except ImportError:
+    _FAISS_AVAILABLE = False
+
+# Score contributions of a query match in each tool field
+NAME_WEIGHT = 0.6
+DESCRIPTION_WEIGHT = 0.3
+PARAMETER_WEIGHT = 0.1
+
+# Length of the character n-grams used to prefilter substring matches
+NGRAM = 3
+
+
+def _encode(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack strings into one UTF-8 byte buffer plus an offsets array."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return buffer, offsets
+
+
+if _NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _contains(buffer, start, end, query):
+        """Return True if ``query`` occurs in ``buffer[start:end]``."""
+        m = len(query)
+        if m == 0:
+            return True
+        first = query[0]
+        for i in range(start, end - m + 1):
+            if buffer[i] == first:
+                for j in range(1, m):
+                    if buffer[i + j] != query[j]:
+                        break
+                else:
+                    return True
+        return False
+
+    @njit(cache=True)
+    def _score(query, name_buf, name_off, desc_buf, desc_off,
+               param_buf, param_off, tool_param_off, scores_out):
+        """Score every tool against ``query``; UTF-8 substring matches are exact."""
+        for i in range(len(scores_out)):
+            score = 0.0
+            if _contains(name_buf, name_off[i], name_off[i + 1], query):
+                score += NAME_WEIGHT
+            if _contains(desc_buf, desc_off[i], desc_off[i + 1], query):
+                score += DESCRIPTION_WEIGHT
+            for p in range(tool_param_off[i], tool_param_off[i + 1]):
+                if _contains(param_buf, param_off[p], param_off[p + 1], query):
+                    score += PARAMETER_WEIGHT
+                    break
+            scores_out[i] = score
+
+
+def serialize_tools(tools: Iterable[ToolDefinition]) -> str:
+    """Serialize the tool fields the LLM ranks on as a compact JSON array."""
+    return orjson.dumps([
+        {
+            "name": tool.name,
+            "description": tool.description,
+            "parameters": {
+                name: {"type": param.type, "description": param.description}
+                for name, param in tool.parameters.items()
+            },
+            "return_type": tool.return_type,
+            "server_name": tool.server_name
+        }
+        for tool in tools
+    ]).decode("utf-8")
+
+
+def _ngrams(text: str) -> Set[str]:
+    """The distinct ``NGRAM``-character substrings of ``text``."""
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def warm_up():
+    """Compile the scoring kernel ahead of the first request."""
+    if _NUMBA_AVAILABLE:
+        ToolIndex([]).score("warm up")
+
+
+def _top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+    """
+    Indices of the ``limit`` highest positive scores, best first.
+
+    Uses a partial partition instead of a full sort; ties keep their original
+    order, matching a stable descending sort.
+    """
+    if limit <= 0:
+        return np.empty(0, dtype=np.intp)
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > limit:
+        candidate_scores = scores[candidates]
+        kth = np.partition(candidate_scores, len(candidates) - limit)[len(candidates) - limit]
+        above = candidates[candidate_scores > kth]
+        ties = candidates[candidate_scores == kth][:limit - len(above)]
+        candidates = np.sort(np.concatenate([above, ties]))
+    order = np.argsort(-scores[candidates], kind="stable")
+    return candidates[order]
+
+
+class ToolIndex(Sequence):
+    """
+    Immutable sequence of tools with their lowercased search fields.
+
+    Encoding happens once when the index is built, and lowercasing once per
+    tool definition, so scoring a query does no per-tool string preparation.
+
+    If ``embeddings`` (one L2-normalized row per tool) are given, ``nearest``
+    shortlists tools by cosine similarity, through a FAISS inner-product index
+    when faiss is installed and a dense matrix-vector product otherwise.
+    """
+
+    def __init__(
+        self,
+        tools: Iterable[ToolDefinition],
+        embeddings: Optional[np.ndarray] = None
+    ):
+        self.tools: List[ToolDefinition] = list(tools)
+        self.names_lc = [tool.name_lc for tool in self.tools]
+        self.descs_lc = [tool.description_lc for tool in self.tools]
+        self.params_lc = [tool.param_descs_lc for tool in self.tools]
+        self._tools_json: Optional[str] = None
+        self._by_name: Optional[Dict[str, ToolDefinition]] = None
+        self._ngrams: Optional[Dict[str, Set[int]]] = None
+
+        self.embeddings = embeddings
+        self._ann = None
+        if embeddings is not None and _FAISS_AVAILABLE:
+            self._ann = faiss.IndexFlatIP(embeddings.shape[1])
+            self._ann.add(embeddings)
+
+        if _NUMBA_AVAILABLE:
+            param_counts = [len(params) for params in self.params_lc]
+            tool_param_off = np.zeros(len(self.tools) + 1, dtype=np.int64)
+            np.cumsum(param_counts, out=tool_param_off[1:])
+            self._encoded = (
+                *_encode(self.names_lc),
+                *_encode(self.descs_lc),
+                *_encode([p for params in self.params_lc for p in params]),
+                tool_param_off,
+            )
+        else:
+            # Parameter descriptions joined per tool so each field is a single
+            # containment test; the separator cannot occur in a real query.
+            self._params_joined = ["\x00".join(params) for params in self.params_lc]
+            self._has_params = np.fromiter(
+                (bool(params) for params in self.params_lc),
+                dtype=bool,
+                count=len(self.tools)
+            )
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+    def __getitem__(self, index):
+        return self.tools[index]
+
+    def __iter__(self):
+        return iter(self.tools)
+
+    @property
+    def tools_json(self) -> str:
+        """The tools serialized for the LLM prompt, computed once per index."""
+        if self._tools_json is None:
+            self._tools_json = serialize_tools(self.tools)
+        return self._tools_json
+
+    @property
+    def by_name(self) -> Dict[str, ToolDefinition]:
+        """Map of tool name to definition, built once per index."""
+        if self._by_name is None:
+            self._by_name = {tool.name: tool for tool in self.tools}
+        return self._by_name
+
+    def score(self, query: str) -> np.ndarray:
+        """Score every tool by where the lowercased ``query`` occurs."""
+        query = query.lower()
+        scores = np.zeros(len(self.tools), dtype=np.float64)
+
+        if _NUMBA_AVAILABLE:
+            encoded_query = np.frombuffer(query.encode("utf-8"), dtype=np.uint8)
+            _score(encoded_query, *self._encoded, scores)
+            return scores
+
+        n = len(self.tools)
+        name_hits = np.fromiter((query in s for s in self.names_lc), dtype=bool, count=n)
+        desc_hits = np.fromiter((query in s for s in self.descs_lc), dtype=bool, count=n)
+        param_hits = np.fromiter((query in s for s in self._params_joined), dtype=bool, count=n)
+        param_hits &= self._has_params
+
+        scores += NAME_WEIGHT * name_hits
+        scores += DESCRIPTION_WEIGHT * desc_hits
+        scores += PARAMETER_WEIGHT * param_hits
+        return scores
+
+    def match(self, query: str, limit: int) -> List[ToolDefinition]:
+        """
+        Return up to ``limit`` tools whose name, description or a parameter
+        description contains ``query``, in index order.
+
+        Queries of at least ``NGRAM`` characters only check tools that contain
+        every n-gram of the query, looked up in an inverted index built on
+        first use; matches are still exact substring matches.
+        """
+        query = query.lower()
+        if len(query) < NGRAM:
+            candidates: Iterable[int] = range(len(self.tools))
+        else:
+            if self._ngrams is None:
+                self._ngrams = self._build_ngrams()
+            postings = sorted(
+                (self._ngrams.get(gram, set()) for gram in _ngrams(query)),
+                key=len
+            )
+            candidates = sorted(postings[0].intersection(*postings[1:]))
+
+        results = []
+        for i in candidates:
+            if (query in self.names_lc[i] or
+                    query in self.descs_lc[i] or
+                    any(query in param for param in self.params_lc[i])):
+                results.append(self.tools[i])
+                if len(results) >= limit:
+                    break
+        return results
+
+    def _build_ngrams(self) -> Dict[str, Set[int]]:
+        """Map every n-gram in the lowercased fields to the tools containing it."""
+        index: Dict[str, Set[int]] = defaultdict(set)
+        for i, (name, desc, params) in enumerate(
+            zip(self.names_lc, self.descs_lc, self.params_lc)
+        ):
+            for text in (name, desc, *params):
+                for gram in _ngrams(text):
+                    index[gram].add(i)
+        return dict(index)
+
+    def top_k(self, query: str, limit: int) -> List[Tuple[ToolDefinition, float]]:
+        """Return up to ``limit`` matching tools with their scores, best first."""
+        scores = self.score(query)
+        return [(self.tools[i], float(scores[i])) for i in _top_k(scores, limit)]
+
+    def nearest(self, embedding: np.ndarray, k: int) -> "ToolIndex":
+        """Return an index of the ``k`` tools most similar to ``embedding``, closest first."""
+        if self._ann is not None:
+            _, ids = self._ann.search(embedding.reshape(1, -1), k)
+            ids = ids[0][ids[0] >= 0]
+        else:
+            sims = self.embeddings @ embedding
+            ids = np.argpartition(-sims, k - 1)[:k] if k < len(sims) else np.arange(len(sims))
+            ids = ids[np.argsort(-sims[ids], kind="stable")]
+        return ToolIndex([self.tools[i] for i in ids])
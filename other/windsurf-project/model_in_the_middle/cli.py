@@ -80,6 +80,22 @@ async def register_server(
         except Exception as e:
             print(f"Error registering server: {e}")
 
+@app.command()
+def export_encoder(
+    output_dir: str,
+    model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+):
+    """Export the embedding model to int8 ONNX for EMBEDDING_ONNX_DIR."""
+    from mitm.embeddings import export_onnx_encoder
+    
+    try:
+        path = export_onnx_encoder(model_name, output_dir)
+    except ImportError as e:
+        print(f"Error exporting encoder: {e}")
+        print('Install the export dependencies with: pip install "model-in-the-middle[onnx-export]"')
+        return
+    print(f"Set EMBEDDING_ONNX_DIR={output_dir} to use {path}")
+
 def main():
     """Entry point for the CLI."""
     app()
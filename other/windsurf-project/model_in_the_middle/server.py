@@ -1,18 +1,50 @@
 """FastAPI server implementation for Model in the Middle."""
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, PrivateAttr
 from typing import Dict, Any, List, Optional
+from bisect import bisect_right
 import httpx
 import json
 from loguru import logger
 
 class ToolDefinition(BaseModel):
     """Definition of an available tool."""
+    # Frozen so the values cached below can't go stale
+    model_config = ConfigDict(frozen=True)
+    
     name: str
     description: str
     parameters: Dict[str, Any]
     server: str
+    
+    # Lowercased copies of the searchable fields, computed on first use
+    _name_lc: Optional[str] = PrivateAttr(default=None)
+    _description_lc: Optional[str] = PrivateAttr(default=None)
+    
+    @property
+    def name_lc(self) -> str:
+        if self._name_lc is None:
+            self._name_lc = self.name.lower()
+        return self._name_lc
+    
+    @property
+    def description_lc(self) -> str:
+        if self._description_lc is None:
+            self._description_lc = self.description.lower()
+        return self._description_lc
+    
+    def model_copy(self, *, update: Optional[Dict[str, Any]] = None, deep: bool = False) -> "ToolDefinition":
+        """Copy the tool, leaving the copy to recompute its cached values."""
+        copied = super().model_copy(update=update, deep=deep)
+        for name in self.__private_attributes__:
+            setattr(copied, name, None)
+        return copied
+
+# Separators in the search corpus; a match never spans two fields
+_FIELD_SEP = "\x1e"
+_TOOL_SEP = "\x1f"
 
 class ToolCall(BaseModel):
     """Request to execute a specific tool."""
@@ -26,26 +58,74 @@ class MITMServer:
         self.app = FastAPI(
             title="Model in the Middle",
             description="Lightweight framework for LLM-MCP server integration",
-            version="0.1.0"
+            version="0.1.0",
+            lifespan=self.lifespan
         )
         self.tools: Dict[str, ToolDefinition] = {}
         self.servers: Dict[str, str] = {}  # server_name -> base_url
         
+        # Searchable text of all tools, rebuilt on first search after a change
+        self._corpus: Optional[str] = None
+        self._corpus_starts: List[int] = []
+        self._corpus_tools: List[ToolDefinition] = []
+        
+        # Shared client so tool calls reuse pooled connections to MCP servers
+        self.client = httpx.AsyncClient(
+            timeout=30.0,
+            http2=True,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100)
+        )
+        
         # Register routes
         self.app.get("/tools")(self.list_tools)
         self.app.post("/call")(self.call_tool)
         self.app.post("/register")(self.register_server)
     
+    @asynccontextmanager
+    async def lifespan(self, app: FastAPI):
+        """Close the shared HTTP client when the app shuts down."""
+        yield
+        await self.close()
+    
     async def list_tools(self, query: str = "") -> List[ToolDefinition]:
         """List all available tools, optionally filtered by query."""
         if not query:
             return list(self.tools.values())
         
         query = query.lower()
-        return [
-            tool for tool in self.tools.values()
-            if query in tool.name.lower() or query in tool.description.lower()
-        ]
+        if _FIELD_SEP in query or _TOOL_SEP in query:
+            return [
+                tool for tool in self.tools.values()
+                if query in tool.name_lc or query in tool.description_lc
+            ]
+        
+        if self._corpus is None:
+            self._build_corpus()
+        
+        # Scan the whole corpus with str.find, then skip to the next tool
+        # after each hit so every matching tool is reported once, in order
+        matches = []
+        pos = self._corpus.find(query)
+        while pos != -1:
+            i = bisect_right(self._corpus_starts, pos) - 1
+            matches.append(self._corpus_tools[i])
+            if i + 1 == len(self._corpus_starts):
+                break
+            pos = self._corpus.find(query, self._corpus_starts[i + 1])
+        return matches
+    
+    def _build_corpus(self):
+        """Concatenate every tool's lowercased fields into one searchable string."""
+        self._corpus_tools = list(self.tools.values())
+        self._corpus_starts = []
+        parts = []
+        offset = 0
+        for tool in self._corpus_tools:
+            part = tool.name_lc + _FIELD_SEP + tool.description_lc
+            self._corpus_starts.append(offset)
+            parts.append(part)
+            offset += len(part) + len(_TOOL_SEP)
+        self._corpus = _TOOL_SEP.join(parts)
     
     async def call_tool(self, tool_call: ToolCall) -> Dict[str, Any]:
         """Execute a tool call by forwarding it to the appropriate MCP server."""
@@ -59,21 +139,23 @@ class MITMServer:
             raise HTTPException(status_code=500, detail=f"Server {tool.server} not found")
         
         # Forward the request to the appropriate MCP server
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{server_url}/{tool.name}",
-                    json=tool_call.parameters,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Error calling tool {tool.name}: {str(e)}")
-                raise HTTPException(
-                    status_code=e.response.status_code,
-                    detail=f"Error from {tool.server}: {e.response.text}"
-                )
+        try:
+            response = await self.client.post(
+                f"{server_url}/{tool.name}",
+                json=tool_call.parameters
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Error calling tool {tool.name}: {str(e)}")
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Error from {tool.server}: {e.response.text}"
+            )
+    
+    async def close(self):
+        """Close the shared HTTP client."""
+        await self.client.aclose()
     
     async def register_server(self, server_name: str, base_url: str, tools: List[Dict[str, Any]]):
         """Register a new MCP server and its tools."""
@@ -87,7 +169,8 @@ class MITMServer:
                 server=server_name
             )
             self.tools[tool.name] = tool
-            
+        
+        self._corpus = None
         return {"status": "success", "tools_registered": len(tools)}
 
     def run(self, host: str = "0.0.0.0", port: int = 8000):
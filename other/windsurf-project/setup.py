@@ -14,14 +14,36 @@ setup(
     url="https://github.com/yourusername/model-in-the-middle",
     packages=find_packages(),
     install_requires=[
-        "fastapi>=0.68.0",
-        "pydantic>=1.8.0",
-        "uvicorn>=0.15.0",
+        "fastapi>=0.100.0",
+        "pydantic>=2.0.0",
+        "pydantic-settings>=2.0.0",
+        "uvicorn[standard]>=0.15.0",
         "python-dotenv>=0.19.0",
-        "httpx>=0.23.0",
+        "httpx[http2]>=0.23.0",
         "loguru>=0.5.3",
         "typer>=0.4.0",
+        "msgspec>=0.18.0",
+        "numpy>=1.20.0",
+        "orjson>=3.6.0",
     ],
+    extras_require={
+        "semantic": [
+            "sentence-transformers>=2.2.0",
+            "hnswlib>=0.7.0",
+            "faiss-cpu>=1.7.0",
+        ],
+        "onnx": [
+            "onnxruntime>=1.14.0",
+            "tokenizers>=0.13.0",
+        ],
+        "onnx-export": [
+            "optimum[onnxruntime]>=1.8.0",
+            "transformers>=4.26.0",
+        ],
+        "fast": [
+            "numba>=0.56.0",
+        ],
+    },
     entry_points={
         "console_scripts": [
             "mitm=model_in_the_middle.cli:main",
@@ -0,0 +1,38 @@
+"""
+Shared fixtures for the test suite.
+
+Fixtures that patch services used by mitm.server (such as
+mock_tool_discovery and mock_llm_interface in test_server.py) live next to
+the tests that use them. Only tests that call the endpoints backed by a
+mock should request it. If a fixture ever needs a mock only some of the
+time, it should fetch it lazily with request.getfixturevalue() rather than
+list it as a parameter.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from mitm.server import app
+
+# Side-effect-free requests that build the app's middleware stack and route
+# handlers before the first test runs
+_WARMUP_PATHS = ("/", "/health", "/servers", "/tools")
+
+@pytest.fixture(scope="session")
+def _warm_app():
+    """Fixture that sends one request per warmup path to the app, once per session."""
+    async def warm_up():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for path in _WARMUP_PATHS:
+                await client.get(path)
+    
+    asyncio.run(warm_up())
+
+@pytest.fixture
+async def aclient(_warm_app):
+    """Fixture that provides an async client calling the FastAPI app in-process."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
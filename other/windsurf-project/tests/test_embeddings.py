@@ -0,0 +1,70 @@
+"""Tests for the local sentence encoders."""
+import numpy as np
+import pytest
+
+from mitm import embeddings
+from mitm.embeddings import load_encoder
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+tokenizers = pytest.importorskip("tokenizers")
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "hello": 2, "world": 3}
+TABLE = np.array([
+    [9.0, 9.0, 9.0],
+    [0.0, 0.0, 1.0],
+    [1.0, 0.0, 0.0],
+    [0.0, 1.0, 0.0],
+], dtype=np.float32)
+
+@pytest.fixture
+def onnx_dir(tmp_path):
+    """Fixture that writes a lookup-table "encoder" and its tokenizer."""
+    from onnx import TensorProto, helper, numpy_helper
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+    
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["last_hidden_state"])],
+        "encoder",
+        [
+            helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "seq"]),
+            helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["batch", "seq"]),
+        ],
+        [helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT, ["batch", "seq", 3])],
+        [numpy_helper.from_array(TABLE, "table")]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(tmp_path / embeddings.ONNX_MODEL_FILE))
+    
+    tokenizer = tokenizers.Tokenizer(WordLevel(VOCAB, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.save(str(tmp_path / embeddings.TOKENIZER_FILE))
+    return str(tmp_path)
+
+def test_onnx_encoder(onnx_dir):
+    """Test mean pooling over real tokens and normalization."""
+    encoder = load_encoder("unused", onnx_dir=onnx_dir)
+    assert isinstance(encoder, embeddings.OnnxEncoder)
+    assert encoder.dim == 3
+    
+    batch = encoder.encode_batch(["hello world", "hello"])
+    assert batch.dtype == np.float32
+    assert batch[0] == pytest.approx([2 ** -0.5, 2 ** -0.5, 0.0])
+    # Padding must not leak into the shorter text's embedding
+    assert batch[1] == pytest.approx([1.0, 0.0, 0.0])
+    assert encoder.encode("hello world") == pytest.approx(batch[0])
+
+def test_encode_cached(onnx_dir):
+    """Test that repeated query texts reuse one read-only embedding."""
+    encoder = load_encoder("unused", onnx_dir=onnx_dir)
+    embedding = encoder.encode("hello world")
+    assert encoder.encode("hello world") is embedding
+    assert not embedding.flags.writeable
+    assert encoder.encode("hello") is not embedding
+
+def test_load_encoder_missing_onnx_model(tmp_path, monkeypatch):
+    """Test that a broken ONNX directory falls back instead of raising."""
+    monkeypatch.setattr(embeddings, "_SENTENCE_TRANSFORMERS_AVAILABLE", False)
+    assert load_encoder("unused", onnx_dir=str(tmp_path)) is None
@@ -0,0 +1,23 @@
+"""Tests for the shared HTTP client."""
+import pytest
+
+from mitm.http import get_http_client, close_http_client
+
+@pytest.mark.asyncio
+async def test_http_client_reused_until_closed():
+    """Test that one client is shared until it is closed, then replaced."""
+    client = get_http_client()
+    assert get_http_client() is client
+    
+    await close_http_client()
+    assert client.is_closed
+    
+    new_client = get_http_client()
+    assert new_client is not client
+    assert not new_client.is_closed
+    
+    await close_http_client()
+    assert new_client.is_closed
+    
+    # Closing with no client open is a no-op
+    await close_http_client()
@@ -2,55 +2,62 @@
 import pytest
 import asyncio
 import json
+import threading
+import numpy as np
 from unittest.mock import AsyncMock, patch
 
-from mitm.llm_interface import LLMInterface
-from mitm.models import ToolDefinition, ParameterSchema, ToolType
+from mitm.llm_interface import LLMInterface, SemanticCache
+from mitm.tool_index import ToolIndex
+from mitm.models import ToolDefinition, ParameterSchema, ToolSearchResult, ToolType
+from mitm.config import settings
 
 @pytest.fixture
 def llm_interface():
     """Fixture that provides an LLMInterface instance with a mock endpoint."""
     return LLMInterface(endpoint="http://mock-llm-endpoint")
 
+# Tools shared by all tests, validated once per module; tests only read them
+_MOCK_TOOLS = (
+    ToolDefinition(
+        name="get_document",
+        description="Get a document by ID",
+        parameters={
+            "document_id": ParameterSchema(
+                type="string",
+                description="ID of the document to retrieve",
+                required=True
+            )
+        },
+        server_name="test_server",
+        tool_type=ToolType.MCP,
+        return_type="Document"
+    ),
+    ToolDefinition(
+        name="search_documents",
+        description="Search for documents",
+        parameters={
+            "query": ParameterSchema(
+                type="string",
+                description="Search query",
+                required=True
+            ),
+            "limit": ParameterSchema(
+                type="integer",
+                description="Maximum number of results to return",
+                required=False,
+                default=10
+            )
+        },
+        server_name="test_server",
+        tool_type=ToolType.MCP,
+        return_type="List[Document]"
+    )
+)
+
 @pytest.fixture
 def mock_tools():
     """Fixture that provides a list of mock tools for testing."""
-    return [
-        ToolDefinition(
-            name="get_document",
-            description="Get a document by ID",
-            parameters={
-                "document_id": ParameterSchema(
-                    type="string",
-                    description="ID of the document to retrieve",
-                    required=True
-                )
-            },
-            server_name="test_server",
-            tool_type=ToolType.MCP,
-            return_type="Document"
-        ),
-        ToolDefinition(
-            name="search_documents",
-            description="Search for documents",
-            parameters={
-                "query": ParameterSchema(
-                    type="string",
-                    description="Search query",
-                    required=True
-                ),
-                "limit": ParameterSchema(
-                    type="integer",
-                    description="Maximum number of results to return",
-                    required=False,
-                    default=10
-                )
-            },
-            server_name="test_server",
-            tool_type=ToolType.MCP,
-            return_type="List[Document]"
-        )
-    ]
+    return list(_MOCK_TOOLS)
 
 @pytest.mark.asyncio
 async def test_initialize_and_close(llm_interface):
@@ -145,3 +152,349 @@ async def test_search_tools_no_matches(llm_interface, mock_tools):
     
     # Clean up
     await llm_interface.close()
+
+class FakeEncoder:
+    """Encoder that maps each known query to a fixed unit vector."""
+    
+    VECTORS = {
+        "find document by id": [1.0, 0.0, 0.0],
+        "find a document by its id": [0.99, 0.141, 0.0],
+        "search for documents": [0.0, 1.0, 0.0],
+    }
+    
+    def encode(self, text):
+        vector = np.asarray(self.VECTORS[text], dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+def test_semantic_cache_lookup(mock_tools):
+    """Test that similar embeddings hit the cache and dissimilar ones miss."""
+    encoder = FakeEncoder()
+    cache = SemanticCache(max_size=4, threshold=0.9)
+    result = ToolSearchResult(
+        tools=mock_tools,
+        confidence_scores={"get_document": 0.9, "search_documents": 0.4}
+    )
+    cache.insert(encoder.encode("find document by id"), result, limit=2)
+    
+    assert cache.lookup(encoder.encode("find a document by its id"), limit=2) is result
+    assert cache.lookup(encoder.encode("search for documents"), limit=2) is None
+    
+    # A larger limit than was cached is a miss, a smaller one is truncated
+    assert cache.lookup(encoder.encode("find document by id"), limit=3) is None
+    truncated = cache.lookup(encoder.encode("find document by id"), limit=1)
+    assert [tool.name for tool in truncated.tools] == ["get_document"]
+    assert truncated.confidence_scores == {"get_document": 0.9}
+
+def test_semantic_cache_lru_eviction(mock_tools):
+    """Test that the least recently used entry is evicted when full."""
+    cache = SemanticCache(max_size=2, threshold=0.9)
+    results = [
+        ToolSearchResult(tools=mock_tools[:1], confidence_scores={}) for _ in range(3)
+    ]
+    vectors = np.eye(3, dtype=np.float32)
+    
+    cache.insert(vectors[0], results[0], limit=1)
+    cache.insert(vectors[1], results[1], limit=1)
+    # Touch the first entry so the second becomes least recently used
+    assert cache.lookup(vectors[0], limit=1) is results[0]
+    cache.insert(vectors[2], results[2], limit=1)
+    
+    assert len(cache) == 2
+    assert cache.lookup(vectors[0], limit=1) is results[0]
+    assert cache.lookup(vectors[1], limit=1) is None
+    assert cache.lookup(vectors[2], limit=1) is results[2]
+
+def test_semantic_cache_hnsw_index(mock_tools, monkeypatch):
+    """Test lookups once the cache has switched to an HNSW index."""
+    pytest.importorskip("hnswlib")
+    monkeypatch.setattr("mitm.llm_interface.HNSW_THRESHOLD", 4)
+    monkeypatch.setattr("mitm.llm_interface.HNSW_MERGE_BATCH", 2)
+    
+    cache = SemanticCache(max_size=8, threshold=0.99)
+    vectors = np.eye(12, dtype=np.float32)
+    results = [
+        ToolSearchResult(tools=mock_tools[:1], confidence_scores={}) for _ in range(12)
+    ]
+    for vector, result in zip(vectors, results):
+        cache.insert(vector, result, limit=1)
+    
+    assert cache._index is not None
+    assert len(cache) == 8
+    # The four oldest entries were evicted, the rest are found whether they
+    # live in the index or in the pending set
+    for i in range(4):
+        assert cache.lookup(vectors[i], limit=1) is None
+    for i in range(4, 12):
+        assert cache.lookup(vectors[i], limit=1) is results[i]
+
+@pytest.mark.parametrize("use_hnsw", [False, True], ids=["dense", "hnsw"])
+def test_semantic_cache_ttl(mock_tools, monkeypatch, use_hnsw):
+    """Test that expired entries miss and are evicted before live ones."""
+    if use_hnsw:
+        pytest.importorskip("hnswlib")
+        monkeypatch.setattr("mitm.llm_interface.HNSW_THRESHOLD", 1)
+    now = [1000.0]
+    monkeypatch.setattr("mitm.llm_interface.time.monotonic", lambda: now[0])
+    
+    cache = SemanticCache(max_size=3, threshold=0.5, ttl=60)
+    vectors = np.eye(4, dtype=np.float32)
+    results = [
+        ToolSearchResult(tools=mock_tools[:1], confidence_scores={}) for _ in range(4)
+    ]
+    cache.insert(vectors[0], results[0], limit=1)
+    cache.insert((vectors[0] + vectors[1]) / np.sqrt(2), results[1], limit=1)
+    now[0] += 30
+    cache.insert(vectors[2], results[2], limit=1)
+    now[0] += 45
+    
+    # The two closest entries have expired, so the live one answers
+    query = vectors[0] + 0.9 * vectors[2]
+    assert cache.lookup(query / np.linalg.norm(query), limit=1) is results[2]
+    assert cache.lookup(vectors[0], limit=1) is None
+    
+    # Inserting into a full cache replaces expired entries, not live ones
+    cache.insert(vectors[3], results[3], limit=1)
+    assert cache.lookup(vectors[2], limit=1) is results[2]
+    assert cache.lookup(vectors[3], limit=1) is results[3]
+
+@pytest.mark.asyncio
+async def test_search_tools_semantic_cache_hit(llm_interface, mock_tools):
+    """Test that a paraphrased query is answered without calling the LLM."""
+    mock_response = [{"name": "get_document", "confidence": 0.95}]
+    
+    with patch('aiohttp.ClientSession.post') as mock_post:
+        mock_resp = AsyncMock()
+        mock_resp.json.return_value = {"text": json.dumps(mock_response)}
+        mock_resp.__aenter__.return_value = mock_resp
+        mock_post.return_value = mock_resp
+        
+        await llm_interface.initialize()
+        encoder = FakeEncoder()
+        encode = encoder.encode
+        threads = []
+        encoder.encode = lambda text: threads.append(threading.get_ident()) or encode(text)
+        llm_interface.encoder = encoder
+        
+        first = await llm_interface.search_tools("find document by id", mock_tools, limit=1)
+        second = await llm_interface.search_tools(
+            "find a document by its id", mock_tools, limit=1
+        )
+        
+        assert mock_post.call_count == 1
+        assert second.tools[0].name == first.tools[0].name == "get_document"
+        # Queries are encoded off the event loop thread
+        assert len(threads) == 2
+        assert threading.get_ident() not in threads
+        
+        await llm_interface.close()
+
+@pytest.mark.asyncio
+async def test_search_tools_semantic_cache_new_tool_set(llm_interface, mock_tools):
+    """Test that cached results are dropped when a new tool snapshot is searched."""
+    mock_response = [{"name": "get_document", "confidence": 0.95}]
+    
+    with patch('aiohttp.ClientSession.post') as mock_post:
+        mock_resp = AsyncMock()
+        mock_resp.json.return_value = {"text": json.dumps(mock_response)}
+        mock_resp.__aenter__.return_value = mock_resp
+        mock_post.return_value = mock_resp
+        
+        await llm_interface.initialize()
+        llm_interface.encoder = FakeEncoder()
+        
+        await llm_interface.search_tools("find document by id", ToolIndex(mock_tools), limit=1)
+        
+        # Same tool names, but rediscovered with a new definition
+        rediscovered = [mock_tools[0].model_copy(update={"description": "Fetch a document"})]
+        rediscovered += mock_tools[1:]
+        result = await llm_interface.search_tools(
+            "find document by id", ToolIndex(rediscovered), limit=1
+        )
+        
+        assert mock_post.call_count == 2
+        assert result.tools[0] is rediscovered[0]
+        
+        await llm_interface.close()
+
+@pytest.mark.asyncio
+async def test_search_tools_semantic_cache_skips_replaced_snapshot(llm_interface, mock_tools):
+    """Test that a search finishing after a newer snapshot arrived is not cached."""
+    old_tools, new_tools = ToolIndex(mock_tools), ToolIndex(mock_tools)
+    release_old = asyncio.Event()
+    ranked = []
+    
+    async def rank_tools(query, tools, limit, catalog_id):
+        ranked.append(query)
+        if tools is old_tools:
+            await release_old.wait()
+        return [(tools[0].name, 0.9)]
+    
+    llm_interface.encoder = FakeEncoder()
+    llm_interface._rank_tools = rank_tools
+    
+    slow = asyncio.create_task(
+        llm_interface.search_tools("find document by id", old_tools, limit=1)
+    )
+    while not ranked:
+        await asyncio.sleep(0)
+    await llm_interface.search_tools("search for documents", new_tools, limit=1)
+    release_old.set()
+    await slow
+    
+    # The old snapshot's result must not answer queries against the new one
+    await llm_interface.search_tools("find a document by its id", new_tools, limit=1)
+    assert ranked == [
+        "find document by id", "search for documents", "find a document by its id"
+    ]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("reply", [
+    "I cannot help with that",
+    json.dumps([]),
+    json.dumps([{"name": "unknown_tool", "confidence": 0.9}]),
+], ids=["unparseable", "empty", "unknown"])
+async def test_search_tools_semantic_cache_skips_padded_results(llm_interface, mock_tools, reply):
+    """Test that results not backed by an LLM ranking are not cached."""
+    with patch('aiohttp.ClientSession.post') as mock_post:
+        mock_resp = AsyncMock()
+        mock_resp.json.return_value = {"text": reply}
+        mock_resp.__aenter__.return_value = mock_resp
+        mock_post.return_value = mock_resp
+        
+        await llm_interface.initialize()
+        llm_interface.encoder = FakeEncoder()
+        
+        await llm_interface.search_tools("find document by id", mock_tools, limit=1)
+        await llm_interface.search_tools("find a document by its id", mock_tools, limit=1)
+        
+        assert mock_post.call_count == 2
+        assert len(llm_interface.semantic_cache) == 0
+        
+        await llm_interface.close()
+
+@pytest.mark.asyncio
+async def test_search_tools_batches_concurrent_queries(llm_interface, mock_tools):
+    """Test that concurrent queries are ranked with a single LLM call."""
+    mock_response = [
+        {"id": 0, "tools": [{"name": "get_document", "confidence": 0.9}]},
+        {"id": 1, "tools": [{"name": "search_documents", "confidence": 0.8}]}
+    ]
+    
+    with patch('aiohttp.ClientSession.post') as mock_post:
+        mock_resp = AsyncMock()
+        mock_resp.json.return_value = {"text": json.dumps(mock_response)}
+        mock_resp.__aenter__.return_value = mock_resp
+        mock_post.return_value = mock_resp
+        
+        await llm_interface.initialize()
+        
+        first, second = await asyncio.gather(
+            llm_interface.search_tools("find document by id", mock_tools, limit=1),
+            llm_interface.search_tools("search for documents", mock_tools, limit=1)
+        )
+        
+        mock_post.assert_called_once()
+        assert '"query": "search for documents"' in json.loads(mock_post.call_args.kwargs["data"])["prompt"]
+        assert first.tools[0].name == "get_document"
+        assert first.confidence_scores["get_document"] == 0.9
+        assert second.tools[0].name == "search_documents"
+        assert second.confidence_scores["search_documents"] == 0.8
+        
+        await llm_interface.close()
+
+@pytest.mark.asyncio
+async def test_search_tools_shortlists_by_embedding(llm_interface, mock_tools, monkeypatch):
+    """Test that only the tools closest to the query are sent to the LLM."""
+    monkeypatch.setattr("mitm.llm_interface.settings.TOOL_ANN_CANDIDATES", 1)
+    mock_response = [{"name": "search_documents", "confidence": 0.9}]
+    
+    with patch('aiohttp.ClientSession.post') as mock_post:
+        mock_resp = AsyncMock()
+        mock_resp.json.return_value = {"text": json.dumps(mock_response)}
+        mock_resp.__aenter__.return_value = mock_resp
+        mock_post.return_value = mock_resp
+        
+        await llm_interface.initialize()
+        llm_interface.encoder = FakeEncoder()
+        embeddings = np.array([[0.0, 0.0, 1.0], [0.0, 1.0, 0.0]], dtype=np.float32)
+        tools = ToolIndex(mock_tools, embeddings)
+        
+        result = await llm_interface.search_tools("search for documents", tools, limit=1)
+        
+        prompt = json.loads(mock_post.call_args.kwargs["data"])["prompt"]
+        assert '"name":"search_documents"' in prompt
+        assert '"name":"get_document"' not in prompt
+        assert result.tools[0].name == "search_documents"
+        
+        await llm_interface.close()
+
+@pytest.mark.asyncio
+async def test_search_tools_shortlist_covers_limit(llm_interface, mock_tools, monkeypatch):
+    """Test that the shortlist never has fewer tools than the caller asked for."""
+    monkeypatch.setattr("mitm.llm_interface.settings.TOOL_ANN_CANDIDATES", 1)
+    mock_response = [{"name": "search_documents", "confidence": 0.9}]
+    
+    with patch('aiohttp.ClientSession.post') as mock_post:
+        mock_resp = AsyncMock()
+        mock_resp.json.return_value = {"text": json.dumps(mock_response)}
+        mock_resp.__aenter__.return_value = mock_resp
+        mock_post.return_value = mock_resp
+        
+        await llm_interface.initialize()
+        llm_interface.encoder = FakeEncoder()
+        tools = mock_tools + [mock_tools[0].model_copy(update={"name": "list_tags"})]
+        embeddings = np.array(
+            [[0.0, 0.0, 1.0], [0.0, 1.0, 0.0], [1.0, 0.0, 0.0]], dtype=np.float32
+        )
+        
+        result = await llm_interface.search_tools(
+            "search for documents", ToolIndex(tools, embeddings), limit=2
+        )
+        
+        prompt = json.loads(mock_post.call_args.kwargs["data"])["prompt"]
+        assert prompt.count('"server_name"') == 2
+        assert len(result.tools) == 2
+        
+        await llm_interface.close()
+
+@pytest.mark.asyncio
+async def test_call_llm_payload(llm_interface):
+    """Test that the pre-serialized payload carries the prompt and settings."""
+    with patch('aiohttp.ClientSession.post') as mock_post:
+        mock_resp = AsyncMock()
+        mock_resp.json.return_value = {"text": " ok "}
+        mock_resp.__aenter__.return_value = mock_resp
+        mock_post.return_value = mock_resp
+        
+        await llm_interface.initialize()
+        prompt = 'Rank "these" tools\nü'
+        assert await llm_interface._call_llm(prompt) == "ok"
+        
+        kwargs = mock_post.call_args.kwargs
+        assert kwargs["headers"]["Content-Type"] == "application/json"
+        assert json.loads(kwargs["data"]) == {
+            "prompt": prompt,
+            "max_tokens": settings.MAX_TOKENS,
+            "temperature": settings.TEMPERATURE,
+        }
+        
+        await llm_interface.close()
+
+def test_parse_llm_response(llm_interface):
+    """Test decoding rankings, including malformed and non-JSON replies."""
+    parse = llm_interface._parse_llm_response
+    assert parse(' [{"name": "a", "confidence": 0.9, "reason": "x"}]') == [("a", 0.9)]
+    assert parse('[{"name": "a", "confidence": "0.5"}]') == [("a", 0.5)]
+    # Malformed items are dropped without losing the well-formed ones
+    assert parse('[{"name": "a"}, {"name": "b", "confidence": 1}, 3]') == [("b", 1.0)]
+    assert parse('Here are the tools: [...]') == []
+    assert parse('[{"name": "a", ') == []
+
+def test_parse_batch_response(llm_interface):
+    """Test decoding batched rankings keyed by query id."""
+    parse = llm_interface._parse_batch_response
+    assert parse('[{"id": 0, "tools": [{"name": "a", "confidence": 0.9}]}]') == {0: [("a", 0.9)]}
+    assert parse(
+        '[{"id": "1", "tools": [{"name": "a"}]}, {"id": "x", "tools": []}, {"id": 2, "tools": 5}]'
+    ) == {1: []}
+    assert parse('{"id": 0}') == {}
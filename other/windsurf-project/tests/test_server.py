@@ -1,124 +1,148 @@
 """Tests for the FastAPI server."""
 import pytest
-import asyncio
-from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+import json
+import orjson
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
 
-from mitm.server import app
-from mitm.models import ToolDefinition, ParameterSchema, ToolType
+from mitm.server import app, lifespan
+from mitm.tool_discovery import MCPServer
+from mitm.tool_index import ToolIndex
+from mitm.models import ToolDefinition, ToolSearchResult, ParameterSchema, ToolType
 
-@pytest.fixture
-def client():
-    """Fixture that provides a test client for the FastAPI app."""
-    with TestClient(app) as test_client:
-        yield test_client
+def rjson(response):
+    """Decode a response body with orjson."""
+    return orjson.loads(response.content)
+
+# Server and tools behind the mocked discovery service, built once per module;
+# tests only read them
+_MOCK_SERVER = MCPServer(name="test_server", description="Test server")
+_MOCK_SERVER.tools = {
+    "get_document": ToolDefinition(
+        name="get_document",
+        description="Get a document by ID",
+        parameters={
+            "document_id": ParameterSchema(
+                type="string",
+                description="ID of the document to retrieve",
+                required=True
+            )
+        },
+        server_name="test_server",
+        tool_type=ToolType.MCP,
+        return_type="Document"
+    )
+}
 
 @pytest.fixture
-def mock_tool_discovery():
+def mock_tool_discovery(monkeypatch):
     """Fixture that mocks the tool discovery service."""
-    with patch('mitm.server.tool_discovery') as mock:
-        # Create a mock server with some tools
-        mock_server = MagicMock()
-        mock_server.name = "test_server"
-        mock_server.description = "Test server"
-        mock_server.tools = {
-            "get_document": ToolDefinition(
-                name="get_document",
-                description="Get a document by ID",
-                parameters={
-                    "document_id": ParameterSchema(
-                        type="string",
-                        description="ID of the document to retrieve",
-                        required=True
-                    )
-                },
-                server_name="test_server",
-                tool_type=ToolType.MCP,
-                return_type="Document"
-            )
-        }
-        mock.servers = {"test_server": mock_server}
-        
-        # Mock the get_all_tools method
-        mock.get_all_tools.return_value = list(mock_server.tools.values())
-        
-        # Mock the get_tool method
-        def get_tool(tool_name):
-            return mock_server.tools.get(tool_name)
-        mock.get_tool.side_effect = get_tool
-        
-        # Mock the search_tools method
-        mock.search_tools.return_value = [mock_server.tools["get_document"]]
-        
-        yield mock
+    # A namespace only has the attributes the endpoints use, so an
+    # unexpected call fails loudly instead of returning a MagicMock
+    tools = list(_MOCK_SERVER.tools.values())
+    mock = SimpleNamespace(
+        servers={"test_server": _MOCK_SERVER},
+        get_all_tools=MagicMock(return_value=tools),
+        get_tool=_MOCK_SERVER.tools.get,
+        get_search_index=AsyncMock(side_effect=lambda: ToolIndex(mock.get_all_tools.return_value))
+    )
+    mock.get_tools_page = (
+        lambda offset, limit: mock.get_all_tools.return_value[offset:offset + limit]
+    )
+    
+    monkeypatch.setattr("mitm.server.tool_discovery", mock)
+    return mock
 
 @pytest.fixture
-def mock_llm_interface():
+def mock_llm_interface(monkeypatch):
     """Fixture that mocks the LLM interface."""
-    with patch('mitm.server.llm_interface') as mock:
-        # Mock the search_tools method
-        mock.search_tools.return_value = MagicMock(
-            tools=[],
-            confidence_scores={}
-        )
-        yield mock
+    # The endpoint awaits search_tools, so it must be an AsyncMock
+    mock = SimpleNamespace(search_tools=AsyncMock(return_value=ToolSearchResult(
+        tools=[_MOCK_SERVER.tools["get_document"]],
+        confidence_scores={"get_document": 0.9}
+    )))
+    monkeypatch.setattr("mitm.server.llm_interface", mock)
+    return mock
 
-def test_root_endpoint(client):
-    """Test the root endpoint."""
-    response = client.get("/")
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path,check", [
+    ("/", lambda data: "name" in data and "version" in data),
+    ("/health", lambda data: data == {"status": "healthy"}),
+], ids=["root", "health"])
+async def test_get_static_endpoint(aclient, path, check):
+    """Test the GET endpoints that do not depend on any service."""
+    response = await aclient.get(path)
     assert response.status_code == 200
-    data = response.json()
-    assert "name" in data
-    assert "version" in data
+    assert check(rjson(response))
 
-def test_list_servers(client, mock_tool_discovery):
-    """Test the list servers endpoint."""
-    response = client.get("/servers")
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path,check", [
+    ("/servers", lambda data: data == [{
+        "name": "test_server",
+        "description": "Test server",
+        "version": "1.0.0",
+        "tools_count": 1
+    }]),
+    ("/tools", lambda data: [tool["name"] for tool in data] == ["get_document"]),
+    ("/tools/get_document", lambda data: data["name"] == "get_document" and "parameters" in data),
+], ids=["servers", "tools", "tool"])
+async def test_get_endpoint(aclient, mock_tool_discovery, path, check):
+    """Test the read-only GET endpoints backed by tool discovery."""
+    response = await aclient.get(path)
     assert response.status_code == 200
-    servers = response.json()
-    assert len(servers) == 1
-    assert servers[0]["name"] == "test_server"
+    assert check(rjson(response))
+
+@pytest.mark.asyncio
+async def test_list_tools_pagination(aclient, mock_tool_discovery):
+    """Test that paginated tool listings match the tools' API representation."""
+    tool = mock_tool_discovery.get_all_tools.return_value[0]
+    
+    response = await aclient.get("/tools?limit=1&offset=0")
+    assert rjson(response) == [json.loads(tool.model_dump_json())]
+    
+    response = await aclient.get("/tools?offset=1")
+    assert rjson(response) == []
 
-def test_list_tools(client, mock_tool_discovery):
-    """Test the list tools endpoint."""
-    response = client.get("/tools")
+@pytest.mark.asyncio
+async def test_list_tools_streaming(aclient, mock_tool_discovery, monkeypatch):
+    """Test that large pages are streamed as the same JSON array."""
+    tool = mock_tool_discovery.get_all_tools.return_value[0]
+    mock_tool_discovery.get_all_tools.return_value = [tool] * 5
+    monkeypatch.setattr("mitm.server.STREAM_THRESHOLD", 2)
+    monkeypatch.setattr("mitm.server.STREAM_CHUNK_SIZE", 2)
+    
+    response = await aclient.get("/tools")
     assert response.status_code == 200
-    tools = response.json()
-    assert len(tools) == 1
-    assert tools[0]["name"] == "get_document"
+    assert "content-length" not in response.headers
+    assert rjson(response) == [json.loads(tool.model_dump_json())] * 5
 
-def test_search_tools(client, mock_tool_discovery, mock_llm_interface):
+@pytest.mark.asyncio
+async def test_search_tools(aclient, mock_tool_discovery, mock_llm_interface):
     """Test the search tools endpoint."""
-    response = client.get("/tools/search?q=document")
+    response = await aclient.get("/tools/search?q=document")
     assert response.status_code == 200
-    result = response.json()
+    result = rjson(response)
     assert "tools" in result
     assert "confidence_scores" in result
     assert len(result["tools"]) == 1
     assert result["tools"][0]["name"] == "get_document"
+    
+    # Results below the minimum confidence are dropped
+    response = await aclient.get("/tools/search?q=document&min_confidence=0.95")
+    assert rjson(response) == {"tools": [], "confidence_scores": {}}
 
-def test_get_tool(client, mock_tool_discovery):
-    """Test getting a specific tool."""
-    response = client.get("/tools/get_document")
-    assert response.status_code == 200
-    tool = response.json()
-    assert tool["name"] == "get_document"
-    assert "parameters" in tool
-
-def test_get_nonexistent_tool(client, mock_tool_discovery):
+@pytest.mark.asyncio
+async def test_get_nonexistent_tool(aclient, mock_tool_discovery):
     """Test getting a tool that doesn't exist."""
-    response = client.get("/tools/nonexistent_tool")
+    response = await aclient.get("/tools/nonexistent_tool")
     assert response.status_code == 404
-    assert "not found" in response.json()["detail"].lower()
+    assert "not found" in rjson(response)["detail"].lower()
 
 @pytest.mark.asyncio
-async def test_execute_tool(client, mock_tool_discovery):
+async def test_execute_tool(aclient, mock_tool_discovery):
     """Test executing a tool."""
-    # Mock the tool execution
-    mock_tool = mock_tool_discovery.servers["test_server"].tools["get_document"]
-    
     # Make the request
-    response = client.post(
+    response = await aclient.post(
         "/execute",
         json={
             "tool_name": "get_document",
@@ -128,14 +152,26 @@ async def test_execute_tool(client, mock_tool_discovery):
     
     # Verify the response
     assert response.status_code == 200
-    result = response.json()
+    result = rjson(response)
     assert result["success"] is True
     assert "message" in result["result"]
     assert result["result"]["parameters"]["document_id"] == "123"
 
-def test_execute_nonexistent_tool(client, mock_tool_discovery):
+@pytest.mark.asyncio
+async def test_execute_tool_invalid_parameters(aclient, mock_tool_discovery):
+    """Test that parameters not matching the tool's schema are rejected."""
+    for parameters in ({}, {"document_id": 123}):
+        response = await aclient.post(
+            "/execute",
+            json={"tool_name": "get_document", "parameters": parameters}
+        )
+        assert response.status_code == 422
+        assert "document_id" in rjson(response)["detail"]
+
+@pytest.mark.asyncio
+async def test_execute_nonexistent_tool(aclient, mock_tool_discovery):
     """Test executing a tool that doesn't exist."""
-    response = client.post(
+    response = await aclient.post(
         "/execute",
         json={
             "tool_name": "nonexistent_tool",
@@ -144,10 +180,30 @@ def test_execute_nonexistent_tool(client, mock_tool_discovery):
     )
     
     assert response.status_code == 404
-    assert "not found" in response.json()["detail"].lower()
+    assert "not found" in rjson(response)["detail"].lower()
 
-def test_health_check(client):
-    """Test the health check endpoint."""
-    response = client.get("/health")
-    assert response.status_code == 200
-    assert response.json() == {"status": "healthy"}
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoder", [None, object()], ids=["no_encoder", "encoder"])
+async def test_lifespan(monkeypatch, encoder):
+    """Test that the lifespan starts the services in order and stops them on exit."""
+    calls = []
+    discovery = SimpleNamespace(
+        embed_tools=lambda enc: calls.append(("embed_tools", enc)),
+        start=AsyncMock(side_effect=lambda: calls.append("start")),
+        register_server=AsyncMock(side_effect=lambda *args: calls.append("register_server")),
+        stop=AsyncMock(side_effect=lambda: calls.append("stop"))
+    )
+    llm = SimpleNamespace(
+        encoder=encoder,
+        initialize=AsyncMock(side_effect=lambda: calls.append("initialize")),
+        close=AsyncMock(side_effect=lambda: calls.append("close"))
+    )
+    monkeypatch.setattr("mitm.server.tool_discovery", discovery)
+    monkeypatch.setattr("mitm.server.llm_interface", llm)
+    
+    async with lifespan(app):
+        started = list(calls)
+    
+    embed = [("embed_tools", encoder)] if encoder is not None else []
+    assert started == ["initialize", *embed, "start", "register_server"]
+    assert calls[len(started):] == ["stop", "close"]
@@ -1,18 +1,31 @@
 """Tests for the tool discovery module."""
 import pytest
 import asyncio
-from datetime import datetime, timedelta
+import json
+import sys
+import msgspec
+import numpy as np
+import orjson
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
 
+from mitm.config import settings
 from mitm.tool_discovery import ToolDiscovery, MCPServer
 from mitm.models import ToolDefinition, ParameterSchema, ToolType
 
 @pytest.fixture
 async def tool_discovery():
     """Fixture that provides a ToolDiscovery instance."""
-    discovery = ToolDiscovery()
+    discovery = ToolDiscovery(settings)
     yield discovery
     await discovery.stop()
 
+@pytest.fixture
+async def registered_server(tool_discovery):
+    """Fixture that registers "test_server", which also discovers its tools."""
+    await tool_discovery.register_server("test_server")
+    return tool_discovery.servers["test_server"]
+
 @pytest.mark.asyncio
 async def test_register_server(tool_discovery):
     """Test registering a new MCP server."""
@@ -58,6 +71,10 @@ async def test_discover_server_tools(tool_discovery):
     server = tool_discovery.servers[server_name]
     assert len(server.tools) > 0
     assert server.last_updated is not None
+    assert datetime.now(timezone.utc) - server.last_updated < timedelta(seconds=5)
+    
+    if sys.version_info >= (3, 10):
+        assert not hasattr(server, "__dict__")
     
     # Check that tool definitions are valid
     for tool in server.tools.values():
@@ -65,16 +82,21 @@ async def test_discover_server_tools(tool_discovery):
         assert tool.name
         assert tool.description
         assert tool.server_name == server_name
+    
+    # The server summary is cached and follows tool changes
+    info_json = server.info_json
+    assert server.info_json is info_json
+    assert json.loads(info_json)["tools_count"] == len(server.tools)
+    tool_discovery.set_server_tools(server_name, {})
+    assert json.loads(server.info_json)["tools_count"] == 0
 
 @pytest.mark.asyncio
-async def test_get_tool(tool_discovery):
+async def test_get_tool(tool_discovery, registered_server):
     """Test getting a specific tool by name."""
-    server_name = "test_server"
-    await tool_discovery.register_server(server_name)
-    await tool_discovery.discover_server_tools(server_name)
+    server = registered_server
+    server_name = server.name
     
     # Get a tool that should exist
-    server = tool_discovery.servers[server_name]
     tool_name = next(iter(server.tools.keys()))
     tool = tool_discovery.get_tool(tool_name)
     
@@ -83,14 +105,84 @@ async def test_get_tool(tool_discovery):
     
     # Get a non-existent tool
     assert tool_discovery.get_tool("non_existent_tool") is None
+    
+    # Rediscovery replaces the tool; unregistering removes it
+    await tool_discovery.discover_server_tools(server_name)
+    assert tool_discovery.get_tool(tool_name) is server.tools[tool_name]
+    assert tool_discovery.get_tool(tool_name) is not tool
+    
+    await tool_discovery.unregister_server(server_name)
+    assert tool_discovery.get_tool(tool_name) is None
 
 @pytest.mark.asyncio
-async def test_search_tools(tool_discovery):
-    """Test searching for tools."""
-    server_name = "test_server"
-    await tool_discovery.register_server(server_name)
-    await tool_discovery.discover_server_tools(server_name)
+async def test_get_tool_shared_name(tool_discovery):
+    """Test that a tool name provided by several servers resolves to the first registered."""
+    await tool_discovery.register_server("first")
+    await tool_discovery.register_server("second")
+    shared = {
+        server_name: ToolDefinition(
+            name="shared_tool",
+            description=f"Shared tool of {server_name}",
+            parameters={},
+            server_name=server_name,
+            tool_type=ToolType.MCP
+        )
+        for server_name in ("first", "second")
+    }
+    
+    # The later server's discovery doesn't take the name over
+    tool_discovery.set_server_tools("first", {"shared_tool": shared["first"]})
+    tool_discovery.set_server_tools("second", {"shared_tool": shared["second"]})
+    assert tool_discovery.get_tool("shared_tool") is shared["first"]
+    tool_discovery.set_server_tools("second", {"shared_tool": shared["second"]})
+    assert tool_discovery.get_tool("shared_tool") is shared["first"]
     
+    # Dropping the first provider falls back to the other one
+    tool_discovery.set_server_tools("first", {})
+    assert tool_discovery.get_tool("shared_tool") is shared["second"]
+    tool_discovery.set_server_tools("first", {"shared_tool": shared["first"]})
+    assert tool_discovery.get_tool("shared_tool") is shared["first"]
+    
+    await tool_discovery.unregister_server("first")
+    assert tool_discovery.get_tool("shared_tool") is shared["second"]
+    await tool_discovery.unregister_server("second")
+    assert tool_discovery.get_tool("shared_tool") is None
+
+@pytest.mark.asyncio
+async def test_validate_parameters(tool_discovery, registered_server):
+    """Test that discovered tools validate call parameters against their schema."""
+    tool = tool_discovery.get_tool(f"{registered_server.name}_search_documents")
+    struct = tool._params_struct
+    assert struct is not None
+    
+    tool.validate_parameters({"query": "report"})
+    tool.validate_parameters({"query": "report", "limit": 5, "extra": True})
+    assert tool.compile_validator() is struct
+    
+    for invalid in ({}, {"query": 1}, {"query": "report", "limit": "5"}):
+        with pytest.raises(msgspec.ValidationError):
+            tool.validate_parameters(invalid)
+
+@pytest.mark.asyncio
+async def test_tool_copy_recomputes_cached_values(tool_discovery, registered_server):
+    """Test that tools are frozen and copies don't inherit stale cached values."""
+    tool = tool_discovery.get_tool(f"{registered_server.name}_search_documents")
+    assert tool.description_lc == tool.description.lower()
+    json_bytes = tool.json_bytes
+    
+    with pytest.raises(ValueError):
+        tool.description = "Changed"
+    
+    copy = tool.model_copy(update={"description": "Find Reports", "parameters": {}})
+    assert copy.description_lc == "find reports"
+    assert copy.json_bytes != json_bytes
+    assert orjson.loads(copy.json_bytes)["description"] == "Find Reports"
+    copy.validate_parameters({})
+    assert tool.json_bytes is json_bytes
+
+@pytest.mark.asyncio
+async def test_search_tools(tool_discovery, registered_server):
+    """Test searching for tools."""
     # Search for tools (should match at least one tool)
     results = tool_discovery.search_tools("document")
     assert len(results) > 0
@@ -99,20 +191,178 @@ async def test_search_tools(tool_discovery):
     results = tool_discovery.search_tools("nonexistent_query_123")
     assert len(results) == 0
 
+@pytest.mark.asyncio
+async def test_get_index(tool_discovery):
+    """Test that the search index is reused until the tool set changes."""
+    await tool_discovery.register_server("test_server")
+    
+    index = tool_discovery.get_index()
+    assert list(index) == tool_discovery.get_all_tools()
+    assert tool_discovery.get_index() is index
+    
+    await tool_discovery.register_server("other_server")
+    index = tool_discovery.get_index()
+    assert len(index) == len(tool_discovery.get_all_tools())
+    
+    await tool_discovery.unregister_server("other_server")
+    assert tool_discovery.get_index() is not index
+    assert list(tool_discovery.get_index()) == tool_discovery.get_all_tools()
+
+@pytest.mark.asyncio
+async def test_get_all_tools_cached(tool_discovery):
+    """Test that the tool list is reused until the tool set changes."""
+    await tool_discovery.register_server("test_server")
+    
+    tools = tool_discovery.get_all_tools()
+    assert tool_discovery.get_all_tools() is tools
+    
+    await tool_discovery.discover_server_tools("test_server")
+    assert tool_discovery.get_all_tools() is not tools
+    
+    tools = tool_discovery.get_all_tools()
+    assert tool_discovery.get_tools_page(1, 2) == tools[1:3]
+    assert tool_discovery.get_tools_page(-5, 1) == tools[:1]
+    assert tool_discovery.get_tools_page(len(tools), 10) == []
+    
+    tool_discovery.set_server_tools("test_server", {})
+    assert tool_discovery.get_all_tools() == []
+    assert tool_discovery.search_tools("document") == []
+
+@pytest.mark.asyncio
+async def test_discover_all_servers_concurrently(tool_discovery):
+    """Test that servers are discovered concurrently and failures are isolated."""
+    await tool_discovery.register_server("slow_server")
+    await tool_discovery.register_server("broken_server")
+    started = []
+    
+    async def discover(server_name):
+        started.append(server_name)
+        await asyncio.sleep(0)
+        # Every discovery has started before any of them finishes
+        assert len(started) == 2
+        if server_name == "broken_server":
+            raise RuntimeError("connection refused")
+        return True
+    
+    with patch.object(tool_discovery, "discover_server_tools", side_effect=discover):
+        results = await tool_discovery.discover_all_servers()
+    
+    assert results == {"slow_server": True, "broken_server": False}
+
+@pytest.mark.asyncio
+async def test_discovery_cache(tool_discovery, tmp_path, monkeypatch):
+    """Test that a restart reuses fresh tools instead of rediscovering them."""
+    path = tmp_path / "discovery.json"
+    monkeypatch.setattr(settings, "TOOL_DISCOVERY_CACHE_PATH", str(path))
+    await tool_discovery.register_server("test_server")
+    tools = tool_discovery.servers["test_server"].tools
+    
+    restarted = ToolDiscovery(settings)
+    with patch.object(restarted, "discover_server_tools", AsyncMock()) as discover:
+        await restarted.start()
+        await restarted.register_server("test_server")
+        await asyncio.sleep(0)
+        await restarted.stop()
+    
+    discover.assert_not_called()
+    assert restarted.servers["test_server"].tools == tools
+    assert restarted.servers["test_server"].last_updated is not None
+    assert restarted.get_tool(next(iter(tools))) == next(iter(tools.values()))
+    
+    # Entries older than the discovery interval are ignored
+    data = json.loads(path.read_text())
+    data["servers"]["test_server"]["discovered_at"] -= settings.TOOL_DISCOVERY_INTERVAL
+    path.write_text(json.dumps(data))
+    
+    stale = ToolDiscovery(settings)
+    await stale.start()
+    await stale.stop()
+    assert stale._discovery_cache == {}
+
+class CountingEncoder:
+    """Encoder that returns random unit vectors and records what it encodes."""
+    
+    def __init__(self):
+        self.encoded = []
+    
+    def encode_batch(self, texts):
+        self.encoded.extend(texts)
+        vectors = np.random.default_rng(0).normal(size=(len(texts), 8))
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+@pytest.mark.asyncio
+async def test_embed_tools(tool_discovery):
+    """Test that tool embeddings are attached to the index and reused."""
+    encoder = CountingEncoder()
+    await tool_discovery.register_server("test_server")
+    tool_discovery.embed_tools(encoder)
+    
+    # The synchronous index never runs the encoder
+    assert tool_discovery.get_index().embeddings is None
+    assert encoder.encoded == []
+    
+    index = await tool_discovery.get_search_index()
+    assert index.embeddings.shape == (len(index), 8)
+    assert len(encoder.encoded) == len(index)
+    assert tool_discovery.get_index() is index
+    assert await tool_discovery.get_search_index() is index
+    
+    # Only the new server's tools are encoded on the next rebuild
+    await tool_discovery.register_server("other_server")
+    index = await tool_discovery.get_search_index()
+    assert index.embeddings.shape == (len(index), 8)
+    assert len(encoder.encoded) == len(index)
+    
+    # Once every tool is cached, rebuilt indexes get embeddings without encoding
+    await tool_discovery.unregister_server("other_server")
+    assert tool_discovery.get_index().embeddings.shape == (len(tool_discovery.get_index()), 8)
+
+@pytest.mark.asyncio
+async def test_get_search_index_concurrent(tool_discovery, tmp_path, monkeypatch):
+    """Test that concurrent searches share one encoding of the index."""
+    path = tmp_path / "embeddings.npz"
+    monkeypatch.setattr(settings, "TOOL_EMBEDDING_CACHE_PATH", str(path))
+    encoder = CountingEncoder()
+    await tool_discovery.register_server("test_server")
+    tool_discovery.embed_tools(encoder)
+    
+    first, second = await asyncio.gather(
+        tool_discovery.get_search_index(),
+        tool_discovery.get_search_index()
+    )
+    assert first is second
+    assert len(encoder.encoded) == len(first)
+    assert tool_discovery.get_index() is first
+    
+    # The cache file is written in place of a temporary file
+    assert path.exists()
+    assert not (tmp_path / "embeddings.npz.tmp").exists()
+
 @pytest.mark.asyncio
 async def test_periodic_discovery(tool_discovery, monkeypatch):
     """Test periodic tool discovery."""
-    # Patch the discovery interval to a small value for testing
-    monkeypatch.setattr(tool_discovery.settings, "TOOL_DISCOVERY_INTERVAL", 0.1)
+    # Run discovery passes back to back instead of waiting for the interval
+    monkeypatch.setattr(tool_discovery.settings, "TOOL_DISCOVERY_INTERVAL", 0)
     
     server_name = "test_server"
     await tool_discovery.register_server(server_name)
     
-    # Start periodic discovery
-    await tool_discovery.start()
+    # Signal once a second pass has run, proving the loop repeats
+    discover_server_tools = tool_discovery.discover_server_tools
+    passes = []
+    repeated = asyncio.Event()
+    
+    async def discover(name):
+        result = await discover_server_tools(name)
+        passes.append(name)
+        if len(passes) >= 2:
+            repeated.set()
+        return result
     
-    # Wait for at least one discovery cycle
-    await asyncio.sleep(0.2)
+    with patch.object(tool_discovery, "discover_server_tools", side_effect=discover):
+        # Start periodic discovery
+        await tool_discovery.start()
+        await asyncio.wait_for(repeated.wait(), timeout=5)
     
     # Verify tools were discovered
     server = tool_discovery.servers[server_name]
@@ -0,0 +1,148 @@
+"""Tests for the tool search index."""
+import json
+import numpy as np
+import pytest
+
+from mitm import tool_index
+from mitm.tool_index import ToolIndex
+from mitm.models import ToolDefinition, ParameterSchema, ToolType
+
+def make_tool(name, description, param_descriptions=()):
+    return ToolDefinition(
+        name=name,
+        description=description,
+        parameters={
+            f"param{i}": ParameterSchema(type="string", description=desc)
+            for i, desc in enumerate(param_descriptions)
+        },
+        server_name="test_server",
+        tool_type=ToolType.MCP
+    )
+
+# Tools matching "document" in different fields, built once per module
+_TOOLS = (
+    make_tool("list_tags", "List all tags"),
+    make_tool("search", "Search Documents", ["Search query"]),
+    make_tool("get_document", "Get a document by ID", ["ID of the Document"]),
+    make_tool("summarize", "Summarize text", ["Document to summarize"]),
+    make_tool("delete_document", "Delete a document"),
+    make_tool("größe", "Berechnet die Größe"),
+)
+
+@pytest.fixture
+def tools():
+    """Fixture that provides tools matching "document" in different fields."""
+    return list(_TOOLS)
+
+@pytest.fixture(params=[True, False], ids=["numba", "python"])
+def use_numba(request, monkeypatch):
+    """Fixture that runs a test with and without the numba kernel."""
+    if request.param and not tool_index._NUMBA_AVAILABLE:
+        pytest.skip("numba not installed")
+    monkeypatch.setattr(tool_index, "_NUMBA_AVAILABLE", request.param)
+    return request.param
+
+def test_score(tools, use_numba):
+    """Test that scores weight name, description and parameter matches."""
+    scores = ToolIndex(tools).score("Document")
+    assert list(scores) == pytest.approx([0.0, 0.3, 1.0, 0.1, 0.9, 0.0])
+
+def test_score_non_ascii(tools, use_numba):
+    """Test matching on non-ASCII text."""
+    scores = ToolIndex(tools).score("GRÖSSE".lower().replace("ss", "ß"))
+    assert list(scores) == pytest.approx([0.0, 0.0, 0.0, 0.0, 0.0, 0.9])
+
+def test_score_empty_query(tools, use_numba):
+    """Test that an empty query only counts parameters on tools that have them."""
+    scores = ToolIndex(tools).score("")
+    assert list(scores) == pytest.approx([0.9, 1.0, 1.0, 1.0, 0.9, 0.9])
+
+def test_score_multiple_parameters(use_numba):
+    """Test that any parameter match counts once and never spans parameters."""
+    index = ToolIndex([make_tool("copy", "Copy a file", ["Source path", "Target path"])])
+    assert list(index.score("target")) == pytest.approx([0.1])
+    assert list(index.score("path")) == pytest.approx([0.1])
+    assert list(index.score("path target")) == pytest.approx([0.0])
+
+def test_top_k(tools, use_numba):
+    """Test that the best matches come first and ties keep their order."""
+    index = ToolIndex(tools)
+
+    top = index.top_k("document", limit=3)
+    assert [tool.name for tool, _ in top] == ["get_document", "delete_document", "search"]
+
+    top = index.top_k("", limit=4)
+    assert [tool.name for tool, _ in top] == [
+        "search", "get_document", "summarize", "list_tags"
+    ]
+
+    assert index.top_k("nothing matches this", limit=3) == []
+    assert index.top_k("document", limit=0) == []
+    assert index.top_k("document", limit=-1) == []
+
+def test_sequence_protocol(tools):
+    """Test that the index behaves like the list it was built from."""
+    index = ToolIndex(tools)
+    assert len(index) == len(tools)
+    assert list(index) == tools
+    assert index[2] is tools[2]
+
+def test_tools_json(tools):
+    """Test that the serialized tools are compact JSON computed once."""
+    index = ToolIndex(tools)
+    data = json.loads(index.tools_json)
+    assert [tool["name"] for tool in data] == [tool.name for tool in tools]
+    assert data[1]["parameters"] == {
+        "param0": {"type": "string", "description": "Search query"}
+    }
+    assert "\n" not in index.tools_json
+    assert index.tools_json is index.tools_json
+
+def test_lowercased_fields_cached_on_tool(tools):
+    """Test that indexes reuse the lowercased fields cached on each tool."""
+    tool = tools[2]
+    assert tool.name_lc == "get_document"
+    assert tool.description_lc == "get a document by id"
+    assert tool.param_descs_lc == ("id of the document",)
+    assert "name_lc" not in tool.model_dump()
+
+    first, second = ToolIndex(tools), ToolIndex(tools)
+    assert first.descs_lc[2] is second.descs_lc[2] is tool.description_lc
+
+@pytest.mark.parametrize("use_faiss", [True, False], ids=["faiss", "numpy"])
+def test_nearest(tools, use_faiss, monkeypatch):
+    """Test shortlisting tools by embedding similarity."""
+    if use_faiss and not tool_index._FAISS_AVAILABLE:
+        pytest.skip("faiss not installed")
+    monkeypatch.setattr(tool_index, "_FAISS_AVAILABLE", use_faiss)
+
+    embeddings = np.eye(len(tools), dtype=np.float32)
+    index = ToolIndex(tools, embeddings)
+    query = np.zeros(len(tools), dtype=np.float32)
+    query[[1, 4]] = [0.6, 0.8]
+
+    nearest = index.nearest(query, 2)
+    assert isinstance(nearest, ToolIndex)
+    assert [tool.name for tool in nearest] == ["delete_document", "search"]
+    assert len(index.nearest(query, 10)) == len(tools)
+
+def test_by_name(tools):
+    """Test that the name lookup is built once and maps to the same objects."""
+    index = ToolIndex(tools)
+    assert index.by_name["get_document"] is tools[2]
+    assert list(index.by_name) == [tool.name for tool in tools]
+    assert index.by_name is index.by_name
+
+@pytest.mark.parametrize("query", ["", "d", "Do", "doc", "Document", "ment by", "größe", "xyz", "by id"])
+def test_match(tools, query):
+    """Test that the n-gram prefilter finds exactly the substring matches."""
+    index = ToolIndex(tools)
+    query_lc = query.lower()
+    expected = [
+        tool for tool in tools
+        if query_lc in tool.name.lower()
+        or query_lc in tool.description.lower()
+        or any(query_lc in param.description.lower() for param in tool.parameters.values())
+    ]
+    assert index.match(query, limit=10) == expected
+    assert index.match(query, limit=2) == expected[:2]